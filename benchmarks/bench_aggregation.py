@@ -0,0 +1,62 @@
+"""
+Benchmarks of aggregating points to polygons, run with `asv run` or `asv dev` from the repo root.
+time_* benchmarks track wall time and peakmem_* benchmarks track the peak memory of the process
+"""
+
+from porygon.porygondataframe import _df_to_h3, _assign_polygon_index
+from porygon.utils import coords_to_voronoi_polygons, df_to_gpdf
+
+from benchmarks.synthetic import synthetic_points, synthetic_boundaries
+
+POINTS = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+class H3Aggregation:
+    params = POINTS
+    param_names = ['n_points']
+    timeout = 1200
+
+    def setup(self, n_points):
+        self.df = synthetic_points(n_points)[['latitude', 'longitude', 'count']]
+
+    def time_df_to_h3(self, n_points):
+        _df_to_h3(self.df, h3_level=8, aggfunc='sum')
+
+    def peakmem_df_to_h3(self, n_points):
+        _df_to_h3(self.df, h3_level=8, aggfunc='sum')
+
+    def time_df_to_h3_mean(self, n_points):
+        _df_to_h3(self.df, h3_level=8, aggfunc='mean')
+
+
+class BoundaryAssignment:
+    params = POINTS
+    param_names = ['n_points']
+    timeout = 1200
+
+    def setup(self, n_points):
+        self.gpdf = df_to_gpdf(synthetic_points(n_points)[['latitude', 'longitude', 'count']])
+        self.polygons = synthetic_boundaries().geometry
+
+    def time_assign_polygon_index(self, n_points):
+        _assign_polygon_index(self.gpdf.copy(), self.polygons)
+
+    def peakmem_assign_polygon_index(self, n_points):
+        _assign_polygon_index(self.gpdf.copy(), self.polygons)
+
+
+class Voronoi:
+    # voronoi cells are built for sites such as transit stops, so scale with the number of sites rather than points
+    params = [1_000, 10_000, 100_000]
+    param_names = ['n_sites']
+    timeout = 600
+
+    def setup(self, n_sites):
+        df = synthetic_points(n_sites, seed=1)
+        self.x, self.y = df['longitude'].values, df['latitude'].values
+
+    def time_coords_to_voronoi_polygons(self, n_sites):
+        coords_to_voronoi_polygons(self.x, self.y)
+
+    def peakmem_coords_to_voronoi_polygons(self, n_sites):
+        coords_to_voronoi_polygons(self.x, self.y)
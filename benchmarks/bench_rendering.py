@@ -0,0 +1,51 @@
+"""
+Benchmarks of serializing and rendering PorygonDataFrames, run with `asv run` or `asv dev` from the repo root.
+Maps are rendered to html in memory, without a browser, geckodriver or map tiles
+"""
+from porygon import PorygonDataFrame
+
+from benchmarks.synthetic import synthetic_points
+
+# h3 levels of 100k points over Chicago, from hundreds to tens of thousands of polygons
+H3_LEVELS = [7, 8, 9, 10]
+
+
+class Rendering:
+    params = H3_LEVELS
+    param_names = ['h3_level']
+    timeout = 600
+
+    def setup(self, h3_level):
+        df = synthetic_points(100_000)
+        self.pdf = PorygonDataFrame().from_h3(df, h3_level=h3_level, aggfunc={'count': 'sum', 'make': 'first'})
+
+    def _clear_cache(self):
+        # serialized geometry is memoized on the frame, so each repeat measures a cold render
+        self.pdf.__dict__.pop('_geometry_cache', None)
+
+    def _render(self, m):
+        m.get_root().render()
+
+    def time_to_feature_collection(self, h3_level):
+        self._clear_cache()
+        self.pdf.to_feature_collection()
+
+    def peakmem_to_feature_collection(self, h3_level):
+        self._clear_cache()
+        self.pdf.to_feature_collection()
+
+    def time_to_choropleth(self, h3_level):
+        self._clear_cache()
+        self._render(self.pdf.to_choropleth('count'))
+
+    def peakmem_to_choropleth(self, h3_level):
+        self._clear_cache()
+        self._render(self.pdf.to_choropleth('count'))
+
+    def time_to_categorical_map(self, h3_level):
+        self._clear_cache()
+        self._render(self.pdf.to_categorical_map('count', 'make'))
+
+    def peakmem_to_categorical_map(self, h3_level):
+        self._clear_cache()
+        self._render(self.pdf.to_categorical_map('count', 'make'))
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+from geopandas import GeoDataFrame
+
+# Extent of Chicago, so synthetic data has the same density of h3 cells and polygons as the real datasets
+BOUNDS = (-87.94, 41.64, -87.52, 42.02)
+CATEGORIES = ['CHEVROLET', 'FORD', 'TOYOTA', 'HONDA', 'NISSAN', 'DODGE', 'JEEP', 'HYUNDAI', 'KIA', 'UNKNOWN']
+
+
+def synthetic_points(n, seed=0):
+    """
+    Random points clustered around hotspots within BOUNDS, generated offline so benchmarks don't need the downloaded datasets
+    Parameters
+    ----------
+    n : number of points
+    seed : random seed, so every run and commit benchmarks the same data
+
+    Returns
+    -------
+    pd.DataFrame with latitude, longitude, a 'count' of 1 and a categorical 'make' column
+    """
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = BOUNDS
+    hotspots = rng.uniform([minx, miny], [maxx, maxy], size=(50, 2))
+    # half the points are spread uniformly, half clustered, as with traffic accidents along busy roads
+    uniform = rng.uniform([minx, miny], [maxx, maxy], size=(n - n // 2, 2))
+    clustered = hotspots[rng.integers(0, len(hotspots), n // 2)] + rng.normal(scale=0.01, size=(n // 2, 2))
+    coords = np.clip(np.concatenate([uniform, clustered]), [minx, miny], [maxx, maxy])
+
+    return pd.DataFrame({
+        'latitude': coords[:, 1],
+        'longitude': coords[:, 0],
+        'count': 1,
+        'make': rng.choice(CATEGORIES, n),
+    })
+
+
+def synthetic_boundaries(n_x=30, n_y=30):
+    """GeoDataFrame of a n_x by n_y grid of boxes covering BOUNDS, indexed by 'id', as a stand-in for census tracts"""
+    minx, miny, maxx, maxy = BOUNDS
+    xs = np.linspace(minx, maxx, n_x + 1)
+    ys = np.linspace(miny, maxy, n_y + 1)
+    geometry = [box(x0, y0, x1, y1) for x0, x1 in zip(xs[:-1], xs[1:]) for y0, y1 in zip(ys[:-1], ys[1:])]
+    gpdf = GeoDataFrame({'geometry': geometry}, index=pd.Index([f'{i:04d}' for i in range(len(geometry))], name='id'))
+    return gpdf
@@ -1 +1,4 @@
-from porygon.porygondataframe import PorygonDataFrame
\ No newline at end of file
+from porygon.porygondataframe import PorygonDataFrame
+from porygon.h3dataframe import H3DataFrame
+from porygon.cube import SpaceTimeCube
+from porygon.instrumentation import profile
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from functools import partial
+from geopandas import GeoDataFrame
+
+from porygon.utils.hexagons import DEFAULT_CHUNKSIZE
+from porygon.utils.join import PolygonIndex
+from porygon.porygondataframe import PorygonDataFrame, _points_to_h3_cells, _points_to_boundary_positions, _points_to_nearest_site, \
+    _h3_aggregate_to_porygon, _positions_aggregate_to_porygon, _validate_boundaries, _voronoi_boundaries
+
+
+class SpaceTimeCube:
+    """
+    Point data aggregated to (polygon, time bucket) cells in a single groupby, e.g. crashes per h3 tile per month.
+    Points are assigned to polygons once and the geometry is built once for all time buckets, then shared by every slice.
+    Can be constructed from point data using from_h3, from_boundaries or from_voronoi
+    Parameters
+    ----------
+    data : pd.DataFrame of the aggregated values, with a sparse (id, time) MultiIndex of only the non-empty cells
+    polygons : PorygonDataFrame of the geometry of every id in data
+    """
+
+    def __init__(self, data: pd.DataFrame, polygons: PorygonDataFrame):
+        self.data = data
+        self.polygons = polygons
+
+    @classmethod
+    def from_h3(cls, df, time_col, freq='M', h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+        """
+        Aggregate point data to h3 tiles and time buckets
+        Parameters
+        ----------
+        df : pd.DataFrame of lat/long data to be aggregated, or GeoDataFrame with valid point geometry
+        time_col : name of the column of the time of each point, as datetimes or strings pd.to_datetime can parse
+        freq : pandas period frequency of the time buckets, e.g. 'M' for months or 'W' for weeks
+        h3_level : resolution of h3 tiles
+        aggfunc : function, str, list or dict to aggregate numeric cols to each cell as per pd.DataFrame.agg(aggfunc)
+        chunksize : number of points indexed per batch
+        n_jobs : number of processes used to index the batches
+
+        Returns
+        -------
+        SpaceTimeCube with index 'id' of h3 tile code
+        """
+        assign = partial(_points_to_h3_cells, h3_level=h3_level, chunksize=chunksize, n_jobs=n_jobs)
+        return cls._from_points(df, time_col, freq, aggfunc, assign, _h3_aggregate_to_porygon)
+
+    @classmethod
+    def from_boundaries(cls, df, boundaries: GeoDataFrame, time_col, freq='M', aggfunc=np.sum):
+        """Aggregate point data to polygon boundaries and time buckets, see from_h3 and PorygonDataFrame.from_boundaries"""
+        srs = _validate_boundaries(boundaries)
+        assign = partial(_points_to_boundary_positions, index=PolygonIndex(srs.values))
+        build = partial(_positions_aggregate_to_porygon, boundaries=boundaries)
+        return cls._from_points(df, time_col, freq, aggfunc, assign, build)
+
+    @classmethod
+    def from_voronoi(cls, df, points: GeoDataFrame, time_col, freq='M', aggfunc=np.sum, n_jobs=1, clip=None):
+        """Aggregate point data to the voronoi cells of a set of sites and time buckets, see from_h3 and PorygonDataFrame.from_voronoi"""
+        sites = _validate_boundaries(points)
+        assign = partial(_points_to_nearest_site, sites=sites, n_jobs=n_jobs, clip=clip)
+        build = partial(_positions_aggregate_to_porygon, boundaries=_voronoi_boundaries(points, clip=clip))
+        return cls._from_points(df, time_col, freq, aggfunc, assign, build)
+
+    @classmethod
+    def _from_points(cls, df, time_col, freq, aggfunc, assign, build):
+        """
+        Build a cube from point data
+        assign : function of point data to the data without coordinates and the key of each point (e.g. uint64 h3 cell or polygon position)
+        build : function of a dataframe indexed by keys to a PorygonDataFrame of their polygons
+        """
+        values, keys = assign(df)
+        times = pd.to_datetime(values.pop(time_col)).dt.to_period(freq).dt.start_time
+        data = values.groupby([keys, times.values]).agg(aggfunc)
+
+        # geometry of each key is built once, and carries its key to relabel the data by polygon id
+        unique_keys = data.index.levels[0]
+        polygons = build(pd.DataFrame({'key': unique_keys}, index=unique_keys))
+        ids = pd.Series(polygons.index, index=polygons['key'].values)
+        data.index = pd.MultiIndex.from_arrays([ids[data.index.get_level_values(0)].values, data.index.get_level_values(1)], names=['id', 'time'])
+
+        return cls(data, polygons.drop(columns='key'))
+
+    @property
+    def times(self):
+        """Sorted time buckets with any data"""
+        return self.data.index.get_level_values('time').unique().sort_values()
+
+    def slice(self, time):
+        """
+        PorygonDataFrame of the polygons with data in one time bucket
+        Parameters
+        ----------
+        time : start of the time bucket, as a Timestamp or string
+        """
+        df = self.data.xs(pd.Timestamp(time), level='time')
+        return PorygonDataFrame._from_trusted(df.join(self.polygons, how='inner'))
+
+    def slices(self):
+        """Iterate over (time, PorygonDataFrame) of each time bucket"""
+        for time in self.times:
+            yield time, self.slice(time)
+
+    def to_time_slider(self, col: str, m=None, location=None, zoom_start=None, colormap=None, opacity=0.7, name='time slider'):
+        """
+        Make folium.plugins.TimeSliderChoropleth map, where the geometry is embedded once and restyled for each time bucket
+        To add a layer to existing map, provide an instance of folium.Map
+        ----------
+        col : Name of column in data to plot
+        m : folium.Map object. If not provided, makes a new map with just the time slider layer
+        colormap : branca.colormap of the values to colors. Default is YlOrRd scaled to the range of col
+        opacity : fill opacity of polygons with data
+        Returns
+        -------
+        folium.Map with added TimeSliderChoropleth layer
+        """
+        from folium.plugins import TimeSliderChoropleth
+        import branca.colormap
+        assert col in self.data.columns, f"col {col} not found in data columns - {self.data.columns.tolist()}"
+        if colormap is None:
+            colormap = branca.colormap.linear.YlOrRd_09.scale(self.data[col].min(), self.data[col].max())
+        if m is None:
+            m = self.polygons._make_base_map(location, zoom_start)
+
+        ids = self.data.index.get_level_values('id')
+        timestamps = (self.data.index.get_level_values('time').astype('int64') // 10 ** 9).astype(str)
+        colors = [colormap(v) for v in self.data[col].values]
+
+        styledict = {id_: {} for id_ in ids.unique()}
+        for id_, timestamp, color in zip(ids, timestamps, colors):
+            styledict[id_][timestamp] = {'color': color, 'opacity': opacity}
+
+        TimeSliderChoropleth(self.polygons.to_geojson(), styledict=styledict, name=name).add_to(m)
+        colormap.caption = col
+        colormap.add_to(m)
+
+        return m
@@ -1,27 +1,149 @@
 import pandas as pd
+import numpy as np
 import json
+import logging
+import operator
 from pathlib import Path
 import os
+import shapely
+from shapely.geometry import shape
+from geopandas import GeoDataFrame
 
 from porygon.data import PROCESSED_DATA_DIR
+from porygon.utils import _validate_point_data, df_to_gpdf
+from porygon.utils.data import _atomic_path
 
+try:
+    import pyarrow  # optional, required for the Parquet cache
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
 
-def load_chicago_traffic_accidents():
-    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), compression='gzip')
-    return df
+# pandas equivalents of the pyarrow filter operators, for when pyarrow isn't installed
+_FILTER_OPS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda s, v: s.isin(v),
+    'not in': lambda s, v: ~s.isin(v),
+}
 
 
-def load_chicago_census_tract_boundaries():
-    with open(Path(PROCESSED_DATA_DIR, 'chicago_census_tract_boundaries.json')) as f:
-        data = json.load(f)
-    return data
+def load_chicago_traffic_accidents(columns=None, filters=None, as_gpdf=False):
+    """
+    Load Chicago traffic accidents, see _load_point_dataset for parameters
+    e.g. load_chicago_traffic_accidents(columns=['latitude', 'longitude', 'make'], filters=[('crash_date', '>=', '2019-06-01')])
+    """
+    return _load_point_dataset('chicago_traffic_accidents.csv.gz', columns, filters, as_gpdf)
 
 
-def load_chicago_L_stops():
-    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_L_stops.csv.gz'), compression='gzip')
-    return df
+def load_chicago_census_tract_boundaries(columns=None, filters=None, as_gpdf=False):
+    """
+    Load Chicago census tract boundaries
+    Parameters
+    ----------
+    columns : list of the tract properties to load, with as_gpdf
+    filters : row filters on the tract properties as per pd.read_parquet(filters=...), with as_gpdf
+    as_gpdf : return a GeoDataFrame of the tract geometry, indexed by 'id' of the tract geoid10, instead of the raw json records.
+              The parsed geometry is cached as WKB beside the json, so shapes are only built on the first call
+
+    Returns
+    -------
+    list of json records, or GeoDataFrame if as_gpdf
+    """
+    source = Path(PROCESSED_DATA_DIR, 'chicago_census_tract_boundaries.json')
+    if not as_gpdf:
+        assert columns is None and filters is None, 'columns and filters require as_gpdf=True'
+        with open(source) as f:
+            data = json.load(f)
+        return data
+
+    def read_source():
+        with open(source) as f:
+            data = json.load(f)
+        df = pd.DataFrame.from_records(data).rename(columns={'geoid10': 'id'})
+        df['geometry'] = shapely.to_wkb(np.array([shape(g) for g in df.pop('the_geom')], dtype=object))
+        return df
+
+    if columns is not None:
+        columns = list(dict.fromkeys(['id', *columns, 'geometry']))
+    df = _read_cached(source, read_source, columns, filters)
+    return GeoDataFrame(df.drop(columns='geometry'), geometry=shapely.from_wkb(df['geometry'].values)).set_index('id')
+
+
+def load_chicago_L_stops(columns=None, filters=None, as_gpdf=False):
+    """Load Chicago CTA L stops, see _load_point_dataset for parameters"""
+    return _load_point_dataset('chicago_L_stops.csv.gz', columns, filters, as_gpdf)
+
+
+def load_air_quality_data(columns=None, filters=None, as_gpdf=False):
+    """Load USA annual air quality by monitor, see _load_point_dataset for parameters"""
+    return _load_point_dataset('air_quality_data.csv.gz', columns, filters, as_gpdf)
 
 
-def load_air_quality_data():
-    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'air_quality_data.csv.gz'), compression='gzip')
+def _load_point_dataset(filename, columns=None, filters=None, as_gpdf=False):
+    """
+    Load a point dataset, from a Parquet cache beside the .csv.gz after the first call
+    Parameters
+    ----------
+    filename : name of the .csv.gz in PROCESSED_DATA_DIR
+    columns : list of columns to load. Default is all columns
+    filters : row filters as per pd.read_parquet(filters=...), e.g. [('year', '==', 2019)] or a list of such lists to OR them
+    as_gpdf : return a GeoDataFrame with point geometry instead of latitude & longitude columns, without rows missing coordinates
+
+    Returns
+    -------
+    pd.DataFrame, or GeoDataFrame if as_gpdf
+    """
+    source = Path(PROCESSED_DATA_DIR, filename)
+    if columns is not None and as_gpdf:
+        columns = list(dict.fromkeys([*columns, 'latitude', 'longitude']))
+
+    df = _read_cached(source, lambda: pd.read_csv(source, compression='gzip'), columns, filters)
+    if as_gpdf:
+        return df_to_gpdf(_validate_point_data(df))
     return df
+
+
+def _read_cached(source: Path, read_source, columns=None, filters=None):
+    """
+    Read a dataset from a Parquet cache beside its source file, memory-mapped and with column projection and row filters pushed down.
+    The cache is built from read_source() on the first call, and rebuilt once the source file is newer.
+    Without pyarrow, or if the cache can't be written, the source is read and filtered with pandas
+    """
+    cache = source.with_name(source.name.split('.')[0] + '.parquet')
+    if _HAS_PYARROW and cache.exists() and (not source.exists() or os.path.getmtime(cache) >= os.path.getmtime(source)):
+        return pd.read_parquet(cache, columns=columns, filters=filters, memory_map=True)
+
+    df = read_source()
+    if _HAS_PYARROW:
+        try:
+            # written beside the cache and moved into place, so an interrupted write never leaves a truncated cache
+            with _atomic_path(cache) as tmp:
+                df.to_parquet(tmp, index=False)
+            return pd.read_parquet(cache, columns=columns, filters=filters, memory_map=True)
+        except OSError as e:
+            logging.warning(f'Could not write dataset cache {cache} - {e}')
+
+    df = _apply_filters(df, filters)
+    return df if columns is None else df[columns]
+
+
+def _apply_filters(df: pd.DataFrame, filters=None):
+    """Apply pd.read_parquet style filters, a list of (column, op, value) conditions or a list of such lists to OR them"""
+    if not filters:
+        return df
+    if not isinstance(filters[0], list):
+        filters = [filters]
+
+    mask = np.zeros(len(df), dtype=bool)
+    for conditions in filters:
+        matched = np.ones(len(df), dtype=bool)
+        for col, op, val in conditions:
+            matched &= _FILTER_OPS[op](df[col], val).values
+        mask |= matched
+    return df[mask].reset_index(drop=True)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from geopandas import GeoSeries
+
+from porygon.utils import h3_to_parent, h3_get_resolution, h3_to_polygons, h3_k_ring_distances
+from porygon.utils.hexagons import DEFAULT_CHUNKSIZE
+from porygon.porygondataframe import _df_to_h3_cells, _chunks_to_h3_cells, _h3_aggregate_to_porygon, _k_ring_smooth_df
+
+
+class H3DataFrame(pd.DataFrame):
+    """
+    A compact, h3-native alternative to an h3 PorygonDataFrame, indexed by uint64 h3 cells rather than string tile codes.
+    Joins and groupbys work on the integer cells, and the hexagons are only built when the geometry is accessed or plotted,
+    so large fine-grained grids fit in memory.
+    Can be constructed from point data using from_points or from_chunks, and converted with to_porygon
+    """
+
+    @property
+    def _constructor(self):
+        return H3DataFrame
+
+    @classmethod
+    def from_points(cls, df, h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+        """Aggregate point data to h3 cells, see PorygonDataFrame.from_h3"""
+        return cls._from_cells(_df_to_h3_cells(df, h3_level, aggfunc, chunksize, n_jobs)[0])
+
+    @classmethod
+    def from_chunks(cls, chunks, h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+        """Streaming version of from_points for an iterable of point data chunks, see PorygonDataFrame.from_h3_chunks"""
+        return cls._from_cells(_chunks_to_h3_cells(chunks, h3_level, aggfunc, chunksize, n_jobs).result())
+
+    @classmethod
+    def _from_cells(cls, df: pd.DataFrame):
+        df = cls(df)
+        df.index = pd.Index(df.index.values.astype('uint64'), name='id')
+        return df
+
+    @property
+    def h3_level(self):
+        """Resolution of the h3 cells"""
+        resolutions = np.unique(h3_get_resolution(self.index.values))
+        assert len(resolutions) <= 1, f'H3DataFrame contains cells of several resolutions {resolutions.tolist()}'
+        return int(resolutions[0]) if len(resolutions) else None
+
+    def _cached(self, key, compute):
+        """Memoize state derived from the cells, which is recomputed once the index is replaced"""
+        cache = self.__dict__.get('_index_cache')
+        if cache is None or cache[0] is not self.index:
+            cache = (self.index, {})
+            object.__setattr__(self, '_index_cache', cache)
+        if key not in cache[1]:
+            cache[1][key] = compute()
+        return cache[1][key]
+
+    @property
+    def geometry(self):
+        """GeoSeries of the hexagon of each cell, built on first access"""
+        polygons = self._cached('polygons', lambda: h3_to_polygons(self.index.values))
+        return GeoSeries(polygons, index=self.index)
+
+    def to_parent(self, h3_level, aggfunc=np.sum):
+        """
+        Roll the values up to the parent cells at a coarser h3_level
+        Parameters
+        ----------
+        h3_level : coarser resolution of h3 tiles
+        aggfunc : function, str, list or dict to aggregate the columns of the child cells as per pd.DataFrame.agg(aggfunc)
+
+        Returns
+        -------
+        H3DataFrame indexed by the parent cells
+        """
+        return self._from_cells(pd.DataFrame(self).groupby(h3_to_parent(self.index.values, h3_level)).agg(aggfunc))
+
+    def k_ring_smooth(self, cols=None, k=1, weights=None, how='mean'):
+        """
+        Smooth the columns over the k-ring of each cell, with the adjacency of the cells cached per k until the index is replaced,
+        see PorygonDataFrame.k_ring_smooth
+        """
+        k_ring_distances = self._cached(('k_ring', k), lambda: h3_k_ring_distances(self.index.values, k))
+        return _k_ring_smooth_df(self, cols, k_ring_distances, k, weights, how)
+
+    def to_porygon(self):
+        """Materialize as a PorygonDataFrame indexed by h3 tile code, reusing the hexagons if they were already built"""
+        polygons = self._cached('polygons', lambda: h3_to_polygons(self.index.values))
+        return _h3_aggregate_to_porygon(pd.DataFrame(self), polygons)
+
+    def to_geojson(self, *args, **kwargs):
+        """See PorygonDataFrame.to_geojson"""
+        return self.to_porygon().to_geojson(*args, **kwargs)
+
+    def to_topojson(self, *args, **kwargs):
+        """See PorygonDataFrame.to_topojson"""
+        return self.to_porygon().to_topojson(*args, **kwargs)
+
+    def to_choropleth(self, *args, **kwargs):
+        """See PorygonDataFrame.to_choropleth"""
+        return self.to_porygon().to_choropleth(*args, **kwargs)
+
+    def to_categorical_map(self, *args, **kwargs):
+        """See PorygonDataFrame.to_categorical_map"""
+        return self.to_porygon().to_categorical_map(*args, **kwargs)
+
+    def to_multi_choropleth(self, *args, **kwargs):
+        """See PorygonDataFrame.to_multi_choropleth"""
+        return self.to_porygon().to_multi_choropleth(*args, **kwargs)
+
+    def to_png(self, *args, **kwargs):
+        """See PorygonDataFrame.to_png"""
+        return self.to_porygon().to_png(*args, **kwargs)
@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+_profiles = []  # active Profile instances, see profile
+_callbacks = []  # functions called with the record of every finished stage, see add_callback
+_local = threading.local()  # stack of the stages currently running in each thread, outermost first, see _stage_stack
+# tracemalloc.reset_peak is new in Python 3.9, before which the peak of a stage is tracked from the peaks traced across it
+_reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+
+class Profile:
+    """
+    Records of the stages run within a profile() block, in the order they finished
+    Each record is a dict of the 'stage' path (e.g. 'from_boundaries/assign'), 'seconds', 'rows_in' and 'rows_out' where known,
+    and with trace_memory the 'memory_delta' and 'memory_peak' in bytes allocated by the stage
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = []
+
+    def to_dict(self):
+        """Dict of the stage records, and the total seconds of the outermost stages"""
+        total = sum(r['seconds'] for r in self.records if '/' not in r['stage'])
+        return {'stages': list(self.records), 'total_seconds': total}
+
+    def to_json(self, fp=None):
+        """
+        Serialize to_dict as JSON
+        ----------
+        fp : writable text file object or path. If not provided, returns the JSON as a string
+        """
+        if fp is None:
+            return json.dumps(self.to_dict())
+        if isinstance(fp, str) or hasattr(fp, '__fspath__'):
+            with open(fp, 'w') as f:
+                json.dump(self.to_dict(), f)
+        else:
+            json.dump(self.to_dict(), fp)
+
+
+@contextmanager
+def profile(trace_memory=False):
+    """
+    Record the timings and row counts of each stage of the PorygonDataFrame constructors and plotting methods run within the block
+    e.g. with profile() as p: PorygonDataFrame().from_boundaries(df, boundaries); p.to_dict()
+    Parameters
+    ----------
+    trace_memory : also record the memory allocated by each stage with tracemalloc, which slows down the profiled code
+
+    Returns
+    -------
+    Profile
+    """
+    p = Profile(trace_memory)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _profiles.append(p)
+    try:
+        yield p
+    finally:
+        _profiles.remove(p)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def add_callback(func):
+    """Call func with the record of every stage as it finishes, e.g. to send timings to monitoring, until remove_callback(func)"""
+    _callbacks.append(func)
+    return func
+
+
+def remove_callback(func):
+    _callbacks.remove(func)
+
+
+def enabled():
+    """Whether any profile or callback is active"""
+    return bool(_profiles or _callbacks)
+
+
+class _NullStage:
+    """Stage used while instrumentation is disabled, which does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **info):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def _stage_stack():
+    """Stages currently running in this thread, outermost first, so that stages run concurrently in other threads don't nest"""
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+class _Stage:
+    def __init__(self, name, info):
+        self.name = name
+        self.record = dict(info)
+        self.trace_memory = tracemalloc.is_tracing() and any(p.trace_memory for p in _profiles)
+
+    def __enter__(self):
+        stack = _stage_stack()
+        self.parent = stack[-1] if stack else None
+        self.path = self.name if self.parent is None else f'{self.parent.path}/{self.name}'
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if _reset_peak is not None:
+                # the peak is reset for each stage, so it is handed up to the enclosing stage to keep its peak
+                if self.parent is not None and self.parent.trace_memory:
+                    self.parent.peak = max(self.parent.peak, peak)
+                _reset_peak()
+                peak = current
+            # only a traced peak above the one at the start of the stage was reached within the stage
+            self.start_memory = self.peak = current
+            self.start_peak = peak
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        _stage_stack().pop()
+        record = {'stage': self.path, 'seconds': seconds, **self.record}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, current, peak) if peak > self.start_peak else max(self.peak, current)
+            record['memory_delta'] = current - self.start_memory
+            record['memory_peak'] = self.peak - self.start_memory
+            if self.parent is not None and self.parent.trace_memory:
+                self.parent.peak = max(self.parent.peak, self.peak)
+
+        for p in _profiles:
+            p.records.append(record)
+        for func in _callbacks:
+            func(record)
+        return False
+
+    def set(self, **info):
+        """Add information to the record of the stage, e.g. set(rows_out=len(df))"""
+        self.record.update(info)
+
+
+def stage(name, **info):
+    """
+    Context manager recording a stage of work, nested within any enclosing stage, e.g. with stage('assign', rows_in=len(df)) as s: ...
+    While no profile or callback is active, returns a shared no-op stage
+    Parameters
+    ----------
+    name : name of the stage
+    info : additional information to record, such as rows_in
+    """
+    if not (_profiles or _callbacks):
+        return _NULL_STAGE
+    return _Stage(name, info)
+
+
+def instrumented(name=None):
+    """Decorator running each call of a function as a stage, named after the function by default"""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not (_profiles or _callbacks):
+                return func(*args, **kwargs)
+            with _Stage(stage_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
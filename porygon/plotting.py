@@ -1,18 +1,20 @@
+import json
 import time
-import folium
-from selenium import webdriver
-from folium.utilities import _tmp_html
-from branca.element import Template, MacroElement
+import numpy as np
 
 
-def _save_map_to_png(m: folium.Map, filepath='mymap', delay=3):
+def _save_map_to_png(m: 'folium.Map', filepath='mymap', delay=3):
   """
   Saves a screenshot of a folium.Map object as a png.
   Similar to folium's existing m._to_png but saves to disk. 
+  For batch jobs, PorygonDataFrame.to_png and render_pngs rasterize without a browser. 
   WARNING - This is a private method because it required a non-essential dependency - 
   you need to install geckodriver - see README for details. 
   """
 
+  from selenium import webdriver
+  from folium.utilities import _tmp_html
+
   try:
     options = webdriver.firefox.options.Options()
     options.add_argument('--headless')
@@ -30,18 +32,258 @@ def _save_map_to_png(m: folium.Map, filepath='mymap', delay=3):
       driver.quit()
 
 
+def equal_width_bins(values, n_bins):
+    """Edges of n_bins equal width bins spanning the finite values, as per folium.Choropleth"""
+    values = np.asarray(values, dtype='float64')
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return np.zeros(n_bins + 1)
+    return np.linspace(finite.min(), finite.max(), n_bins + 1)
+
+
+def render_png(geometries, facecolors, fp=None, legend=None, legend_title=None, legend_marker='s', figsize=(8, 8), dpi=100,
+               opacity=0.7, edgecolor='black', linewidth=0.3, background='white', bounds=None):
+    """
+    Rasterize filled polygons to a PNG with matplotlib's Agg backend, without a browser or map tiles.
+    Drawing is a single PathCollection, so renders take milliseconds for thousands of polygons
+        :param geometries: array of shapely Polygons and MultiPolygons in longitude/latitude
+        :param facecolors: fill color of each geometry
+        :param fp: path or writable binary file object. If not provided, returns the PNG as bytes
+        :param legend: dictionary of legend labels to colors
+        :param legend_marker: matplotlib marker of the legend entries, 'h' for the hexagons of add_h3_legend
+        :param bounds: (minx, miny, maxx, maxy) extent of the map. Default is the extent of the geometries
+    """
+    import io
+    import shapely
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import PathCollection
+    from matplotlib.lines import Line2D
+    from matplotlib.path import Path
+
+    geometries = np.asarray(geometries, dtype=object)
+    parts, part_index = shapely.get_parts(geometries, return_index=True)
+    # empty polygons, e.g. voronoi cells clipped away, and degenerate rings have nothing to draw
+    drawn = ~shapely.is_empty(parts) & (shapely.get_num_coordinates(shapely.get_exterior_ring(parts)) >= 3)
+    parts, part_index = parts[drawn], part_index[drawn]
+    paths = []
+    for polygon in parts:
+        # exterior and holes make up one compound path, so holes are left unfilled
+        rings = [np.asarray(polygon.exterior.coords)] + [np.asarray(ring.coords) for ring in polygon.interiors if len(ring.coords) >= 3]
+        codes = np.concatenate([np.r_[Path.MOVETO, np.full(len(ring) - 2, Path.LINETO), Path.CLOSEPOLY] for ring in rings])
+        paths.append(Path(np.concatenate(rings), codes))
+
+    fig = Figure(figsize=figsize, dpi=dpi, facecolor=background)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    facecolors = np.asarray(facecolors, dtype=object)[part_index]
+    ax.add_collection(PathCollection(paths, facecolors=list(facecolors), edgecolors=edgecolor, linewidths=linewidth, alpha=opacity))
+
+    if bounds is None:
+        bounds = shapely.total_bounds(parts) if len(parts) else (0, 0, 1, 1)
+    minx, miny, maxx, maxy = bounds
+    pad_x, pad_y = (maxx - minx) * 0.02 or 0.01, (maxy - miny) * 0.02 or 0.01
+    ax.set_xlim(minx - pad_x, maxx + pad_x)
+    ax.set_ylim(miny - pad_y, maxy + pad_y)
+    # degrees of longitude shrink with latitude, as on a web map
+    ax.set_aspect(1 / np.cos(np.radians((miny + maxy) / 2)))
+
+    if legend:
+        handles = [Line2D([], [], linestyle='', marker=legend_marker, markersize=12, markerfacecolor=color, markeredgecolor='none', label=label)
+                   for label, color in legend.items()]
+        ax.legend(handles=handles, title=legend_title, loc='lower right', framealpha=0.8)
+
+    buffer = io.BytesIO() if fp is None else fp
+    fig.savefig(buffer, format='png', dpi=dpi, facecolor=background)
+    if fp is None:
+        return buffer.getvalue()
+
+
+def _render_job(job):
+    pdf, fp, kwargs = job
+    return pdf.to_png(fp, **kwargs)
+
+
+def render_pngs(jobs, n_jobs=-1):
+    """
+    Render many PorygonDataFrames to PNGs in parallel processes, e.g. nightly thumbnails
+        :param jobs: iterable of (PorygonDataFrame, fp, dict of PorygonDataFrame.to_png keyword arguments)
+        :param n_jobs: number of processes, -1 for all cpus. 1 renders in the current process
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from porygon.utils.jobs import _resolve_n_jobs
+
+    jobs = list(jobs)
+    n_jobs = min(_resolve_n_jobs(n_jobs), max(len(jobs), 1))
+    if n_jobs == 1:
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(n_jobs) as executor:
+        return list(executor.map(_render_job, jobs))
+
+
 def add_h3_legend(m, color_key:dict, title='Legend (draggable!)'):
     """
     Adds a legend for a categorical variable, dislayed by a colored hexagon.
         :param color_key: dictionary whose keys are the category names and values are the color codes
         :title: legend title
     """
+    from branca.element import Template, MacroElement
     macro = MacroElement()
     macro._template = Template(make_h3_legend_html(color_key, title=title))
     m.get_root().add_child(macro)
     return m
 
 
+def add_style_table(layer, drop_properties=()):
+    """
+    Style the features of a folium.TopoJson layer from a table of its distinct styles. folium embeds the full style of every
+    feature in its properties, which can outweigh the topology itself, so instead each feature gets the index of its style.
+        :param layer: folium.TopoJson layer, e.g. the geojson attribute of a folium.Choropleth made with topojson
+        :param drop_properties: feature properties only used by the style_function, which aren't embedded
+    """
+    from branca.element import Template
+    data = layer.data
+    for key in layer.object_path.split('.'):
+        data = data[key]
+
+    table, positions = [], {}
+    for feature in data['geometries']:
+        style = layer.style_function(feature)
+        key = json.dumps(style, sort_keys=True)
+        if key not in positions:
+            positions[key] = len(table)
+            table.append(style)
+        properties = feature.setdefault('properties', {})
+        for name in drop_properties:
+            properties.pop(name, None)
+        properties[_STYLE_PROPERTY] = positions[key]
+
+    layer.style_table = table
+    layer.style_data = lambda: None  # styles are looked up client-side rather than embedded
+    layer._template = Template(STYLE_TABLE_TOPOJSON_TEMPLATE)
+    return layer
+
+
+_STYLE_PROPERTY = '_porygon_style'
+
+STYLE_TABLE_TOPOJSON_TEMPLATE = """
+{% macro script(this, kwargs) %}
+    var {{ this.get_name() }}_data = {{ this.data|tojson }};
+    var {{ this.get_name() }}_styles = {{ this.style_table|tojson }};
+    var {{ this.get_name() }} = L.geoJson(
+        topojson.feature(
+            {{ this.get_name() }}_data,
+            {{ this.get_name() }}_data.{{ this.object_path }}
+        ),
+        {
+        {%- if this.smooth_factor is not none %}
+            smoothFactor: {{ this.smooth_factor|tojson }},
+        {%- endif %}
+        }
+    ).addTo({{ this._parent.get_name() }});
+    {{ this.get_name() }}.setStyle(function(feature) {
+        return {{ this.get_name() }}_styles[feature.properties.""" + _STYLE_PROPERTY + """];
+    });
+{% endmacro %}
+"""
+
+
+def add_layer_switcher(m, layer, layers: dict, default=None, title='Layer', opacity=0.7, nan_fill_color='black', nan_fill_opacity=0.1,
+                       line_color='black', line_weight=1, line_opacity=1):
+    """
+    Adds a control to switch which column colors the features of a single GeoJson or TopoJson layer, restyling the features
+    client-side, so the geometry is embedded once for any number of columns.
+        :param layer: folium.GeoJson or folium.TopoJson layer of the features, without a style_function
+        :param layers: dictionary of layer names to dicts of the 'values' of each feature (in the order of the features, None if missing),
+                       the 'bins' edges and the 'colors' of each bin
+        :param default: name of the layer shown initially. Default is the first
+        :param title: title of the control
+    """
+    from branca.element import Template, MacroElement
+    options = {
+        'default': default if default is not None else next(iter(layers)),
+        'title': title,
+        'fill_opacity': opacity,
+        'nan_fill_color': nan_fill_color,
+        'nan_fill_opacity': nan_fill_opacity,
+        'line_color': line_color,
+        'line_weight': line_weight,
+        'line_opacity': line_opacity,
+    }
+    macro = MacroElement()
+    macro._template = Template(LAYER_SWITCHER_TEMPLATE)
+    macro.layer = layer
+    macro.layers_json = json.dumps(layers, separators=(',', ':'))
+    macro.options_json = json.dumps(options)
+    m.add_child(macro)
+    return m
+
+
+LAYER_SWITCHER_TEMPLATE = """
+{% macro script(this, kwargs) %}
+(function() {
+    var map = {{ this._parent.get_name() }};
+    var features = {{ this.layer.get_name() }}.getLayers();
+    var layers = {{ this.layers_json }};
+    var options = {{ this.options_json }};
+    var current = options.default;
+
+    function color(layer, value) {
+        for (var i = 1; i < layer.bins.length - 1; i++) {
+            if (value < layer.bins[i]) { return layer.colors[i - 1]; }
+        }
+        return layer.colors[layer.colors.length - 1];
+    }
+
+    function legend(layer) {
+        var html = '';
+        for (var i = 0; i < layer.colors.length; i++) {
+            html += '<div><span style="display:inline-block;width:18px;height:12px;margin-right:6px;background:' + layer.colors[i] + '"></span>'
+                + layer.bins[i].toPrecision(3) + ' - ' + layer.bins[i + 1].toPrecision(3) + '</div>';
+        }
+        return html;
+    }
+
+    function show(name) {
+        current = name;
+        var layer = layers[name];
+        features.forEach(function(feature, i) {
+            var value = layer.values[i];
+            var missing = value === null;
+            feature.setStyle({
+                fillColor: missing ? options.nan_fill_color : color(layer, value),
+                fillOpacity: missing ? options.nan_fill_opacity : options.fill_opacity,
+                color: options.line_color, weight: options.line_weight, opacity: options.line_opacity
+            });
+        });
+        document.getElementById('{{ this.get_name() }}_legend').innerHTML = legend(layer);
+    }
+
+    features.forEach(function(feature, i) {
+        feature.bindTooltip(function() { return current + ': ' + layers[current].values[i]; });
+    });
+
+    var control = L.control({position: 'topright'});
+    control.onAdd = function() {
+        var div = L.DomUtil.create('div', 'info legend');
+        div.style.cssText = 'background:rgba(255,255,255,0.8);padding:6px 8px;border-radius:5px;font-size:12px';
+        var select = '<b>' + options.title + '</b><br><select id="{{ this.get_name() }}_select">';
+        Object.keys(layers).forEach(function(name) {
+            select += '<option' + (name === current ? ' selected' : '') + '>' + name + '</option>';
+        });
+        div.innerHTML = select + '</select><div id="{{ this.get_name() }}_legend" style="margin-top:6px"></div>';
+        L.DomEvent.disableClickPropagation(div);
+        div.querySelector('select').addEventListener('change', function(e) { show(e.target.value); });
+        return div;
+    };
+    control.addTo(map);
+    show(current);
+})();
+{% endmacro %}
+"""
+
+
 def make_h3_legend_html(color_key: dict, title: str):
     """
     Generate html needed for color-coded hexagons  
@@ -1,19 +1,28 @@
 import numpy as np 
 import pandas as pd
-import geopandas
+from functools import partial
+from pathlib import Path
+import shapely
 from geopandas import GeoDataFrame, GeoSeries
-import geojson
-from geojson import Feature, FeatureCollection
-from shapely.geometry import Point, Polygon
-from h3 import h3
-import folium
-import seaborn as sns
 from pandas.api.types import is_string_dtype, is_numeric_dtype
+from pandas.core import indexing
 import logging
 
-from porygon.utils import _validate_point_data, df_to_gpdf, gpdf_to_latlong_df
-from porygon.utils import coords_to_voronoi_polygons
-from porygon.plotting import add_h3_legend
+from porygon.utils import _validate_point_data
+from porygon.utils import coords_to_voronoi_polygons, nearest_site, points_in_clip
+from porygon.utils import latlong_to_h3, h3_to_parent, h3_to_str, h3_to_polygons, str_to_h3, h3_k_ring_distances, k_ring_smooth
+from porygon.utils.hexagons import DEFAULT_CHUNKSIZE
+from porygon.utils.join import PolygonIndex, PolygonAssignment, points_in_polygons, assignment_key
+from porygon.utils.aggregation import PartialAggregate, is_mergeable
+from porygon.utils.serialize import geometries_to_json, write_feature_collection
+from porygon.utils.topology import to_topology, write_topojson, zoom_to_tolerance
+from porygon.utils.parallel import parallel_h3_aggregate, parallel_boundary_aggregate, parallel_points_in_polygons
+from porygon.instrumentation import stage, instrumented
+
+# folium, seaborn and geojson are imported on first use by the plotting and serialization methods,
+# so importing porygon for aggregation alone doesn't load them
+
+_COLOR_PROPERTY = '_porygon_color'  # feature property holding the precomputed fill color of categorical maps
 
 
 class PorygonDataFrame(GeoDataFrame):
@@ -29,11 +38,87 @@ class PorygonDataFrame(GeoDataFrame):
             self._validate_index()
             self._validate_geometry()
 
-            centroids = self.centroid
-            self.centroid_point = [centroids.y.mean(), centroids.x.mean()]  # don't want to overwrite self.centroid attribute
-            # Rough logic - seems to work for Chicago but TBD if generalizes at higher/lower scales
-            self.zoom_start = round(max(centroids.x.quantile(0.95) - centroids.x.quantile(0.05), centroids.y.quantile(0.95) - centroids.y.quantile(0.05)) * 35)
-            # self.map = self._make_base_map()  # may be used later to allowing layering
+    @classmethod
+    def _from_trusted(cls, *args, **kwargs):
+        """
+        Construct without validation, for internal constructors and selections of frames that were already validated.
+        The geometry is still validated lazily before it is serialized, see _validate_geometry
+        """
+        self = cls.__new__(cls)
+        GeoDataFrame.__init__(self, *args, **kwargs)
+        return self
+
+    @property
+    def _constructor(self):
+        return _porygondataframe_constructor_with_fallback
+
+    def reset_index(self, *args, **kwargs):
+        return self._with_valid_index(super().reset_index(*args, **kwargs))
+
+    def set_index(self, *args, **kwargs):
+        return self._with_valid_index(super().set_index(*args, **kwargs))
+
+    def set_axis(self, *args, **kwargs):
+        return self._with_valid_index(super().set_axis(*args, **kwargs))
+
+    def rename(self, *args, **kwargs):
+        return self._with_valid_index(super().rename(*args, **kwargs))
+
+    def _with_valid_index(self, result):
+        """
+        Result of an operation that replaces the index of a copy, falling back to a GeoDataFrame if the new index isn't valid.
+        Operations in place fall back the same way, by the frame itself becoming a GeoDataFrame, rather than converting the index.
+        pandas also replaces the index in place on intermediate copies, e.g. merging on the index name of a PorygonDataFrame
+        """
+        if result is not None:
+            return _fallback_if_invalid_index(result)
+        if len(self) > 0 and not self._has_valid_index():
+            self.__dict__.pop('_geometry_cache', None)
+            object.__setattr__(self, '__class__', GeoDataFrame)
+        return None
+
+    def __getitem__(self, key):
+        """As per GeoDataFrame.__getitem__, but selections that keep the geometry column remain PorygonDataFrames"""
+        result = super().__getitem__(key)
+        if type(result) is GeoDataFrame and result._geometry_column_name in result:
+            result.__class__ = PorygonDataFrame
+        return result
+
+    @property
+    def centroid_point(self):
+        """[lat, long] of the mean centroid of the polygons, the default location of maps. Can be set to override it"""
+        # named so as not to overwrite the GeoDataFrame.centroid attribute
+        if self.__dict__.get('_centroid_point') is not None:
+            return self.__dict__['_centroid_point']
+        return self._cached('centroid_point', lambda: [self._centroids().y.mean(), self._centroids().x.mean()])
+
+    @centroid_point.setter
+    def centroid_point(self, value):
+        self.__dict__['_centroid_point'] = value
+
+    @property
+    def zoom_start(self):
+        """Default zoom level of maps. Can be set to override it"""
+        if self.__dict__.get('_zoom_start') is not None:
+            return self.__dict__['_zoom_start']
+
+        # Rough logic - seems to work for Chicago but TBD if generalizes at higher/lower scales
+        def compute():
+            centroids = self._centroids()
+            return round(max(centroids.x.quantile(0.95) - centroids.x.quantile(0.05), centroids.y.quantile(0.95) - centroids.y.quantile(0.05)) * 35)
+        return self._cached('zoom_start', compute)
+
+    @zoom_start.setter
+    def zoom_start(self, value):
+        self.__dict__['_zoom_start'] = value
+
+    def _centroids(self):
+        return self._cached('centroids', lambda: self.centroid)
+
+    def _has_valid_index(self):
+        """Whether the index is already as _validate_index requires, without converting it"""
+        index = self.index
+        return type(index) != pd.MultiIndex and not is_numeric_dtype(index) and index.is_unique
 
     def _validate_index(self): 
         """Validate the PorygonDataFrame index will behave when used with to_feature_collection and plotting"""
@@ -44,31 +129,187 @@ class PorygonDataFrame(GeoDataFrame):
             self.index = self.index.astype('str')
 
     def _validate_geometry(self):
-        assert all(self.geometry.geom_type.isin(["MultiPolygon", "Polygon"])), 'PorygonDataFrame only supports Polygon and MultiPolygon'
+        """Validated once per geometry, so only frames whose geometry has since been replaced are validated again"""
+        def validate():
+            assert all(self.geometry.geom_type.isin(["MultiPolygon", "Polygon"])), 'PorygonDataFrame only supports Polygon and MultiPolygon'
+            return True
+        self._cached('valid_geometry', validate)
 
     def from_gpdf(self, gpdf):
         # TODO - isn't this constructor superfluous, given that it functions the same as __init___ ? Dunno if this explicit constructor is helpful or confusing
         assert isinstance(gpdf, GeoDataFrame)
         return PorygonDataFrame(gpdf) 
 
-    def from_h3(self, df, h3_level=8, aggfunc=np.sum):
-        return _df_to_h3(df, h3_level=h3_level, aggfunc=aggfunc)
+    @instrumented()
+    def from_h3(self, df, h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+        return _df_to_h3(df, h3_level=h3_level, aggfunc=aggfunc, chunksize=chunksize, n_jobs=n_jobs)
+
+    @instrumented()
+    def from_boundaries(self, df: pd.DataFrame, boundaries: GeoDataFrame, aggfunc=np.sum, n_jobs=1, cache_dir=None):
+        return _df_to_boundaries(df, boundaries, aggfunc, n_jobs=n_jobs, cache_dir=cache_dir)
+
+    @instrumented()
+    def join_boundaries(self, df: pd.DataFrame, boundaries: GeoDataFrame, n_jobs=1, cache_dir=None):
+        """Assign point data to the polygon boundaries once, returns a BoundaryJoin that can be aggregated many times"""
+        return _join_boundaries(df, boundaries, n_jobs=n_jobs, cache_dir=cache_dir)
+
+    @instrumented()
+    def from_voronoi(self, df: pd.DataFrame, points: GeoDataFrame, aggfunc=np.sum, n_jobs=1, clip=None):
+        return _df_to_voronoi(df, points, aggfunc, n_jobs=n_jobs, clip=clip)
+
+    @instrumented()
+    def from_h3_pyramid(self, df, h3_levels=(6, 7, 8, 9, 10), aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+        """Aggregate point data to several h3 levels from a single indexing pass, returns a dict of h3_level to PorygonDataFrame"""
+        return _df_to_h3_pyramid(df, h3_levels=h3_levels, aggfunc=aggfunc, chunksize=chunksize, n_jobs=n_jobs)
+
+    @instrumented()
+    def from_h3_chunks(self, chunks, h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+        """Streaming version of from_h3 for an iterable of point data chunks, e.g. pd.read_csv(..., chunksize=...)"""
+        return _chunks_to_h3(chunks, h3_level=h3_level, aggfunc=aggfunc, chunksize=chunksize, n_jobs=n_jobs)
+
+    @instrumented()
+    def from_boundaries_chunks(self, chunks, boundaries: GeoDataFrame, aggfunc=np.sum):
+        """Streaming version of from_boundaries for an iterable of point data chunks, e.g. pd.read_csv(..., chunksize=...)"""
+        return _chunks_to_boundaries(chunks, boundaries, aggfunc)
+
+    @instrumented()
+    def from_voronoi_chunks(self, chunks, points: GeoDataFrame, aggfunc=np.sum, clip=None):
+        """Streaming version of from_voronoi for an iterable of point data chunks, e.g. pd.read_csv(..., chunksize=...)"""
+        return _chunks_to_voronoi(chunks, points, aggfunc, clip=clip)
+
+    @instrumented()
+    def update_points(self, df):
+        """
+        Fold new point data into the aggregates of a PorygonDataFrame constructed from point data with a mergeable aggfunc,
+        e.g. by from_h3 or from_boundaries. Only the new points are assigned to polygons,
+        so the cost depends on the number of new points rather than all the points aggregated so far.
+        Parameters
+        ----------
+        df : pd.DataFrame of lat/long data with the same columns as the original point data, or GeoDataFrame with valid point geometry
+
+        Returns
+        -------
+        PorygonDataFrame of the aggregates of all the points, which can be updated in turn. Columns added after construction are not kept
+        """
+        state = self.__dict__.get('_aggregate_state')
+        assert state is not None, 'update_points requires a PorygonDataFrame constructed from point data with a mergeable aggfunc'
+        aggregate, assign, build = state
+
+        aggregate = PartialAggregate(aggregate.aggfunc).merge(aggregate).update(*assign(df))
+        return _attach_aggregate(build(aggregate.result()), aggregate, assign, build)
+
+    @instrumented()
+    def k_ring_smooth(self, cols=None, k=1, weights=None, how='mean'):
+        """
+        Smooth the columns of an h3 PorygonDataFrame over the k-ring of each cell, e.g. to even out sparse counts of fine-grained cells
+        The adjacency of the cells is built once per k and cached until the geometry changes, so smoothing other columns,
+        weights or how reuses it. Cells missing from the PorygonDataFrame don't contribute to their neighbours
+        Parameters
+        ----------
+        cols : numeric columns to smooth. Default is all numeric columns
+        k : grid distance of the neighbourhood
+        weights : weight of each grid distance, see porygon.utils.k_ring_smooth. Default decays linearly with distance
+        how : 'mean' for the weighted mean of the neighbours with values, or 'sum' for the weighted neighbourhood sum
+
+        Returns
+        -------
+        PorygonDataFrame with the smoothed columns
+        """
+        k_ring_distances = self._cached(('k_ring', k), lambda: h3_k_ring_distances(str_to_h3(self.index), k))
+        return _k_ring_smooth_df(self, cols, k_ring_distances, k, weights, how)
+
+    def _cached(self, key, compute):
+        """Memoize state derived from the geometry, which is recomputed once the geometry is replaced or edited in place"""
+        geometry = self.geometry.values
+        cache = self.__dict__.get('_geometry_cache')
+        if cache is None or cache[0] is not geometry:
+            cache = (geometry, {})
+            object.__setattr__(self, '_geometry_cache', cache)
+        if key not in cache[1]:
+            cache[1][key] = compute()
+        return cache[1][key]
+
+    # Edits through loc, iloc, at and iat write into the same geometry array rather than replacing it,
+    # so their indexers drop the derived state before writing. Reads keep it
+    @property
+    def loc(self):
+        return _LocIndexer('loc', self)
+
+    @property
+    def iloc(self):
+        return _iLocIndexer('iloc', self)
+
+    @property
+    def at(self):
+        return _AtIndexer('at', self)
+
+    @property
+    def iat(self):
+        return _iAtIndexer('iat', self)
+
+    def _maybe_cache_changed(self, item, value, inplace):
+        # edits of the geometry column selected from the frame, e.g. p.geometry.iloc[0] = ...
+        if item == self._geometry_column_name:
+            self.__dict__.pop('_geometry_cache', None)
+        super()._maybe_cache_changed(item, value, inplace)
 
-    def from_boundaries(self, df: pd.DataFrame, boundaries: GeoDataFrame, aggfunc=np.sum):
-        return _df_to_boundaries(df, boundaries, aggfunc)
+    @instrumented()
+    def to_geojson(self, fp=None, precision=6):
+        """
+        Serialize to a compact GeoJSON FeatureCollection, written straight from the coordinate arrays
+        The serialized geometry is cached until the geometry changes, so only the properties are serialized on repeated calls
+        ----------
+        fp : writable text file object or path. If not provided, returns the GeoJSON as a string
+        precision : number of decimals of the coordinates
+        Returns
+        -------
+        GeoJSON string if fp is not provided
+        """
+        return self._write_geojson(self._properties(), fp, precision)
+
+    def _properties(self):
+        return pd.DataFrame(self.drop(columns=self.geometry.name))
 
-    def from_voronoi(self, df: pd.DataFrame, points: GeoDataFrame, aggfunc=np.sum):
-        polygons = coords_to_voronoi_polygons(points.geometry.x, points.geometry.y)
-        df_voronoi = points.set_geometry(polygons)
-        return _df_to_boundaries(df, df_voronoi, aggfunc)
+    def _write_geojson(self, properties: pd.DataFrame, fp=None, precision=6):
+        """Write the cached serialized geometry with the given properties, aligned with self"""
+        with stage('validate_geometry', rows_in=len(self)):
+            self._validate_geometry()
+        with stage('serialize', rows_in=len(self)):
+            geometries_json = self._cached(('geojson', precision), lambda: geometries_to_json(self.geometry.values, precision))
+            return write_feature_collection(self.index.astype(str), geometries_json, properties, fp)
 
-    def to_feature_collection(self):
+    def to_feature_collection(self, precision=6):
         """
-        Wrapper for GeoDataFrame._to_geo() that returns the Python dict as geojson.FeatureCollection
+        Returns the PorygonDataFrame as geojson.FeatureCollection
         The features 'id' values correspond to the 'id' index of the PorygonDataFrame, which is helpful for plotting utilities
         """
-        fc  = FeatureCollection([Feature(id = f['id'], geometry=f['geometry'], properties=f['properties']) for f in self._to_geo()['features']])
-        return fc
+        import geojson
+        return geojson.loads(self.to_geojson(precision=precision))
+
+    @instrumented()
+    def to_topojson(self, precision=6, simplify_zoom=None, object_name='porygon'):
+        """
+        Encode as a TopoJSON Topology, where borders shared by neighbouring polygons are stored once as quantized, delta-encoded arcs
+        The topology is cached until the geometry changes
+        ----------
+        precision : number of decimals of the quantized coordinates
+        simplify_zoom : if provided, simplify the arcs to about a pixel at this web map zoom level. 
+                        Neighbouring polygons stay joined since their shared border is simplified once
+        object_name : name of the GeometryCollection in the topology objects, i.e. the path to the features is f'objects.{object_name}'
+        Returns
+        -------
+        dict of the TopoJSON Topology
+        """
+        return self._write_topojson(self._properties(), precision, simplify_zoom, object_name)
+
+    def _write_topojson(self, properties: pd.DataFrame, precision=6, simplify_zoom=None, object_name='porygon'):
+        """Build a Topology of the cached topology with the given properties, aligned with self"""
+        with stage('validate_geometry', rows_in=len(self)):
+            self._validate_geometry()
+        tolerance = None if simplify_zoom is None else zoom_to_tolerance(simplify_zoom)
+        with stage('topology', rows_in=len(self)):
+            topology = self._cached(('topojson', precision, simplify_zoom), lambda: to_topology(self.geometry.values, precision, tolerance=tolerance))
+        return write_topojson(self.index.astype(str), topology, properties, object_name)
 
     def _make_base_map(self, location=None, zoom_start=None):
         # TODO - should be class attribute 
@@ -76,39 +317,59 @@ class PorygonDataFrame(GeoDataFrame):
             location=self.centroid_point
         if zoom_start is None:
             zoom_start=self.zoom_start
+        import folium
         return folium.Map(location=location, zoom_start=zoom_start) 
 
-    def to_choropleth(self, col: str, m=None, location=None, zoom_start=None, fill_color='YlOrRd', **kwargs):
+    @instrumented()
+    def to_choropleth(self, col: str, m=None, location=None, zoom_start=None, fill_color='YlOrRd', topojson=False, simplify_zoom=None, precision=6,
+                      **kwargs):
         """
         Make folium.Choropleth map
         To add a layer to existing map, provide an instance of folium.Map
         ----------
         col : Name of column in dataframe to plot
         m : folium.Map object. If not provided, makes a new map with just the choropleth layer
+        topojson : embed the layer as TopoJSON with shared borders and quantized coordinates, for smaller pages. See to_topojson
+                   and plotting.add_style_table. Grids save the least, since every hexagon vertex is a junction of shared borders
+        simplify_zoom : with topojson, simplify the polygons to about a pixel at this zoom level. Only polygons with detailed
+                        borders, e.g. census tracts, are simplified - the edges of grid cells have no vertices to remove
+        precision : number of decimals of the embedded coordinates
         Returns
         -------
         folium.Map with added Choropleth layer 
         """
+        import folium
+        from porygon.plotting import add_style_table
         assert col in self.columns, f"col {col} not found in dataframe columns - {self.columns.tolist()}"
 
         # TODO - allow layering to self.map 
         if m is None:
             m = self._make_base_map(location, zoom_start)
 
-        folium.Choropleth(
-            geo_data=self.to_feature_collection(),
-            name='choropleth',
-            data=self.reset_index(), 
-            columns=['id', col],
-            key_on='feature.id',
-            fill_color=fill_color,
-            **kwargs
-        ).add_to(m)
+        # features are colored by id, so only the mapped column is embedded in their properties, e.g. for tooltips
+        properties = pd.DataFrame({col: self[col]})
+        if topojson:
+            kwargs['topojson'] = 'objects.porygon'
+        geo_data = self._write_topojson(properties, precision, simplify_zoom) if topojson else self._write_geojson(properties, precision=precision)
+        with stage('layer', rows_in=len(self)):
+            choropleth = folium.Choropleth(
+                geo_data=geo_data,
+                name='choropleth',
+                data=self.reset_index(), 
+                columns=['id', col],
+                key_on='feature.id',
+                fill_color=fill_color,
+                **kwargs
+            )
+            if topojson:
+                add_style_table(choropleth.geojson)
+            choropleth.add_to(m)
 
         return m
 
+    @instrumented()
     def to_categorical_map(self, val_col: str, cat_col: str, m=None, location=None, zoom_start=None, color_key=None, 
-        nan_fill_color='black', legend_title='Legend', **kwargs):
+        nan_fill_color='black', legend_title='Legend', topojson=False, simplify_zoom=None, precision=6, **kwargs):
         """
         Make custom folium.GeoJson with categorical observations 
         To add a layer to existing map, provide an instance of folium.Map
@@ -116,61 +377,294 @@ class PorygonDataFrame(GeoDataFrame):
         val_col : Name of column with values 
         cat_col : Name of column with categorical values 
         m : folium.Map object. If not provided, makes a new map with just the categorical map layer
+        topojson : embed the layer as folium.TopoJson with shared borders and quantized coordinates, for smaller pages.
+                   See to_choropleth
+        simplify_zoom : with topojson, simplify the polygons with detailed borders to about a pixel at this zoom level
+        precision : number of decimals of the embedded coordinates
         Returns
         -------
         folium.Map with added layer 
         """
         # TODO - refactor this elsewhere
+        import folium
+        from porygon.plotting import add_h3_legend, add_style_table
         assert val_col in self.columns, f"val_col {val_col} not found in dataframe columns - {self.columns.tolist()}"
         assert cat_col in self.columns, f"cat_col {cat_col} not found in dataframe columns - {self.columns.tolist()}"
         assert is_numeric_dtype(self[val_col]), f'{val_col} is not numeric'
         assert is_string_dtype(self[cat_col]), f'{cat_col} is not string'
 
         if color_key is None: 
-            categories = self[cat_col].value_counts().index  # default is sort by frequency
-            colors = sns.color_palette('deep', 10).as_hex() + sns.color_palette('bright', 10).as_hex()
-
-            if len(categories) > len(colors):
-                # TODO - log a warning that can only take top n colors
-                color_key = dict(zip(categories[:len(colors)], colors))
-            else: 
-                color_key = dict(zip(categories, colors[:len(categories)]))
+            color_key = _default_color_key(self[cat_col])
 
         # TODO - allow layering to self.map 
         if m is None:
             m = self._make_base_map(location, zoom_start)
 
+        # Colors are mapped once for the whole column and embedded in the feature properties,
+        # so styling a feature is a dict lookup of one of the precomputed styles rather than a row lookup
+        colors = self[cat_col].map(color_key).fillna(nan_fill_color)
+        opacity = 0.7
+        styles = {color: {'weight': 2, 'opacity': opacity, 'color': color, 'fillColor': color, 'fillOpacity': opacity} for color in colors.unique()}
+        properties = pd.DataFrame({cat_col: self[cat_col], val_col: self[val_col], _COLOR_PROPERTY: colors})
+
         def style_function(feature):
-            row = self.loc[feature['id']]
-            if row[cat_col] in color_key.keys():
-                color = color_key[row[cat_col]] 
-            else: 
-                color = nan_fill_color 
-            opacity = 0.7 
-            return {
-                'weight': 2,
-                'opacity': opacity,
-                'color': color,
-                'fillColor': color,
-                'fillOpacity': opacity, 
-            }
-
-        folium.GeoJson(
-            self.to_feature_collection(),
-            style_function=style_function,
-            tooltip=folium.features.GeoJsonTooltip(
-                fields=[cat_col, val_col],
-                # aliases=['Category', 'Value'],
-            ),
-            **kwargs
-        ).add_to(m)
+            return styles[feature['properties'][_COLOR_PROPERTY]]
+
+        tooltip = folium.features.GeoJsonTooltip(
+            fields=[cat_col, val_col],
+            # aliases=['Category', 'Value'],
+        )
+        if topojson:
+            data = self._write_topojson(properties, precision, simplify_zoom)
+            with stage('layer', rows_in=len(self)):
+                layer = folium.TopoJson(data, 'objects.porygon', style_function=style_function, tooltip=tooltip, **kwargs)
+                add_style_table(layer, drop_properties=[_COLOR_PROPERTY])
+        else:
+            data = self._write_geojson(properties, precision=precision)
+            with stage('layer', rows_in=len(self)):
+                layer = folium.GeoJson(data, style_function=style_function, tooltip=tooltip, **kwargs)
+        layer.add_to(m)
 
         m = add_h3_legend(m, color_key, legend_title)
 
         return m
 
+    @instrumented()
+    def to_png(self, fp=None, col=None, cat_col=None, fill_color='YlOrRd', bins=6, color_key=None, nan_fill_color='black',
+        legend_title=None, **kwargs):
+        """
+        Rasterize the polygons straight to a PNG with matplotlib, colored as per to_choropleth (col) or to_categorical_map (cat_col),
+        without a browser or map tiles. See plotting.render_pngs to render many maps in parallel
+        ----------
+        fp : path or writable binary file object. If not provided, returns the PNG as bytes
+        col : name of a numeric column, colored by equal width bins of the fill_color palette
+        cat_col : name of a string column, colored by color_key with a hexagon legend of the categories
+        color_key : dictionary of categories to colors. Default is as per to_categorical_map
+        legend_title : title of the legend. Default is col or cat_col
+        kwargs : as per plotting.render_png, e.g. figsize, dpi, opacity or edgecolor
+        Returns
+        -------
+        PNG bytes if fp is not provided
+        """
+        from branca.utilities import color_brewer
+        from porygon.plotting import render_png, equal_width_bins
+        assert (col is None) != (cat_col is None), 'provide one of col or cat_col'
+        self._validate_geometry()
+
+        if col is not None:
+            assert col in self.columns, f"col {col} not found in dataframe columns - {self.columns.tolist()}"
+            assert is_numeric_dtype(self[col]), f'{col} is not numeric'
+            values = self[col].astype('float64').values
+            colors = color_brewer(fill_color, n=bins)
+            edges = equal_width_bins(values, len(colors))
+            positions = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(colors) - 1)
+            facecolors = np.where(np.isfinite(values), np.array(colors, dtype=object)[positions], nan_fill_color)
+            legend = {f'{a:.3g} - {b:.3g}': color for a, b, color in zip(edges[:-1], edges[1:], colors)}
+            marker = 's'
+        else:
+            assert cat_col in self.columns, f"cat_col {cat_col} not found in dataframe columns - {self.columns.tolist()}"
+            assert is_string_dtype(self[cat_col]), f'{cat_col} is not string'
+            if color_key is None:
+                color_key = _default_color_key(self[cat_col])
+            facecolors = self[cat_col].map(color_key).fillna(nan_fill_color).values
+            legend = color_key
+            marker = 'h'
+
+        legend_title = legend_title or col or cat_col
+        return render_png(self.geometry.values, facecolors, fp, legend=legend, legend_title=legend_title, legend_marker=marker, **kwargs)
+
+    @instrumented()
+    def to_multi_choropleth(self, cols=None, m=None, location=None, zoom_start=None, fill_color='YlOrRd', bins=6, default=None,
+        name='porygon', topojson=False, simplify_zoom=None, precision=6, value_digits=4, **kwargs):
+        """
+        Make a folium map of several numeric columns over the same polygons, e.g. one per metric or car make, 
+        where the geometry is embedded once and each column is a compact array of values. 
+        A control on the map switches which column colors the polygons, client-side, so the page stays about the size of one layer
+        To add the layers to existing map, provide an instance of folium.Map
+        ----------
+        cols : list of names of numeric columns to plot. Default is every numeric column
+        m : folium.Map object. If not provided, makes a new map with just the switchable layer
+        fill_color : color brewer palette of the bins, as per folium.Choropleth
+        bins : number of equal width bins of the values of each column
+        default : name of the column shown initially. Default is the first
+        topojson : embed the geometry as TopoJSON with shared borders and quantized coordinates, for smaller pages. See to_topojson
+        simplify_zoom : with topojson, simplify the polygons to about a pixel at this zoom level
+        precision : number of decimals of the embedded coordinates
+        value_digits : number of significant digits of the embedded values
+        kwargs : styling of the features as per plotting.add_layer_switcher, e.g. opacity or line_color
+        Returns
+        -------
+        folium.Map with added layer and layer switcher
+        """
+        import folium
+        from branca.utilities import color_brewer
+        from porygon.plotting import add_layer_switcher, equal_width_bins
+        if cols is None:
+            cols = [c for c in self.columns if c != self.geometry.name and is_numeric_dtype(self[c])]
+        assert len(cols) > 0, 'no numeric columns to plot'
+        for col in cols:
+            assert col in self.columns, f"col {col} not found in dataframe columns - {self.columns.tolist()}"
+            assert is_numeric_dtype(self[col]), f'{col} is not numeric'
+        if default is not None and default not in cols:
+            raise ValueError(f'default {default} is not one of the plotted columns - {list(cols)}')
+
+        if m is None:
+            m = self._make_base_map(location, zoom_start)
+
+        # geometry only, the values of each column are attached to the switcher in the order of the features
+        no_properties = pd.DataFrame(index=self.index)
+        if topojson:
+            layer = folium.TopoJson(self._write_topojson(no_properties, precision, simplify_zoom), 'objects.porygon', name=name)
+        else:
+            layer = folium.GeoJson(self._write_geojson(no_properties, precision=precision), name=name)
+        layer.add_to(m)
+
+        colors = color_brewer(fill_color, n=bins)
+        layers = {}
+        for col in cols:
+            values = self[col].astype('float64').values
+            edges = equal_width_bins(values, len(colors))
+            rounded = [None if not np.isfinite(v) else float(f'{v:.{value_digits}g}') for v in values]
+            layers[str(col)] = {'values': rounded, 'bins': edges.tolist(), 'colors': colors}
+
+        with stage('layer', rows_in=len(self)):
+            add_layer_switcher(m, layer, layers, default=None if default is None else str(default), **kwargs)
+
+        return m
+
+
+class _DropsGeometryCache:
+    """Indexer whose writes drop the derived state of the PorygonDataFrame, see PorygonDataFrame._cached"""
+
+    def __setitem__(self, key, value):
+        self.obj.__dict__.pop('_geometry_cache', None)
+        super().__setitem__(key, value)
+
+
+class _LocIndexer(_DropsGeometryCache, indexing._LocIndexer):
+    pass
+
+
+class _iLocIndexer(_DropsGeometryCache, indexing._iLocIndexer):
+    pass
+
+
+class _AtIndexer(_DropsGeometryCache, indexing._AtIndexer):
+    pass
+
+
+class _iAtIndexer(_DropsGeometryCache, indexing._iAtIndexer):
+    pass
+
+
+def _default_color_key(srs: pd.Series):
+    """Colors of the categories of srs, by descending frequency. Only the 20 most frequent categories get a color"""
+    import seaborn as sns
+    categories = srs.value_counts().index  # default is sort by frequency
+    colors = sns.color_palette('deep', 10).as_hex() + sns.color_palette('bright', 10).as_hex()
+
+    if len(categories) > len(colors):
+        # TODO - log a warning that can only take top n colors
+        return dict(zip(categories[:len(colors)], colors))
+    return dict(zip(categories, colors[:len(categories)]))
+
+
+def _porygondataframe_constructor_with_fallback(*args, **kwargs):
+    """
+    PorygonDataFrame._constructor for pandas operations. The geometry of the result derives from a validated frame,
+    so it is only validated lazily, but the index is checked since operations such as concat or reset_index don't preserve it.
+    Falls back to a GeoDataFrame if the index isn't valid, or a DataFrame as per geopandas if the operation drops the geometry column
+    """
+    df = PorygonDataFrame._from_trusted(*args, **kwargs)
+    geometry_cols_mask = df.dtypes == "geometry"
+    if len(geometry_cols_mask) == 0 or geometry_cols_mask.sum() == 0:
+        df = pd.DataFrame(df)
+    return _fallback_if_invalid_index(df)
+
+
+def _fallback_if_invalid_index(df):
+    if isinstance(df, PorygonDataFrame) and len(df) > 0 and not df._has_valid_index():
+        return GeoDataFrame(df)
+    return df
+
+
+def _df_to_voronoi(df: pd.DataFrame, points: GeoDataFrame, aggfunc=np.sum, n_jobs=1, clip=None):
+    """
+    Aggregates point data to the voronoi cells of a set of sites
+    Since a voronoi cell is the set of locations nearest to its site, points are assigned with a nearest neighbour query,
+    and the voronoi polygons are only built for display.
+    Parameters
+    ----------
+    df : pd.DataFrame of lat/long data to be aggregated, or GeoDataFrame with valid point geometry
+    points : GeoDataFrame with point geometry of the voronoi sites
+    aggfunc : function, str, list or dict to aggregate numeric cols to polygon as per pd.DataFrame.agg(aggfunc)
+    n_jobs : number of threads used for the nearest neighbour query, -1 for all cpus
+    clip : shapely geometry or (minx, miny, maxx, maxy) bounding box to clip the voronoi polygons to, see coords_to_voronoi_polygons.
+           Points outside the clip are dropped, so the clipped cells only aggregate the points they contain
+
+    Returns
+    -------
+    PorygonDataFrame of the dataframe aggregated to voronoi cells, with index 'id' of the points's 'id' index
+    """
+    sites = _validate_boundaries(points)
+    assign = partial(_points_to_nearest_site, sites=sites, n_jobs=n_jobs, clip=clip)
+    build = partial(_positions_aggregate_to_porygon, boundaries=_voronoi_boundaries(points, clip=clip))
+
+    df, aggregate = _aggregate_points(*assign(df), aggfunc)
+    return _attach_aggregate(build(df), aggregate, assign, build)
+
+
+def _chunks_to_voronoi(chunks, points: GeoDataFrame, aggfunc=np.sum, clip=None):
+    """
+    Streaming version of _df_to_voronoi, that aggregates an iterable of point data chunks
+    Parameters
+    ----------
+    chunks : iterable of pd.DataFrame or GeoDataFrame point data, e.g. pd.read_csv(..., chunksize=...)
+    points : GeoDataFrame with point geometry of the voronoi sites
+    aggfunc : mergeable aggregation(s) 'sum', 'count', 'mean', 'min', 'max' as a str, function, list or dict as per pd.DataFrame.agg(aggfunc)
+    clip : shapely geometry or (minx, miny, maxx, maxy) bounding box to clip the voronoi polygons to, see coords_to_voronoi_polygons.
+           Points outside the clip are dropped, so the clipped cells only aggregate the points they contain
+
+    Returns
+    -------
+    PorygonDataFrame of the dataframe aggregated to voronoi cells, with index 'id' of the points's 'id' index
+    """
+    sites = _validate_boundaries(points)
+    assign = partial(_points_to_nearest_site, sites=sites, clip=clip)
+    build = partial(_positions_aggregate_to_porygon, boundaries=_voronoi_boundaries(points, clip=clip))
+
+    aggregate = PartialAggregate(aggfunc)
+    for df in chunks:
+        with stage('chunk', rows_in=len(df)):
+            df, keys = assign(df)
+            with stage('aggregate', rows_in=len(df)):
+                aggregate.update(df, keys)
+
+    return _attach_aggregate(build(aggregate.result()), aggregate, assign, build)
+
+
+def _points_to_nearest_site(df, sites: GeoSeries, n_jobs=1, clip=None):
+    """
+    Validate point data and return the data without coordinates, and the position of the nearest site to each point.
+    Points outside the clip geometry, if provided, are dropped
+    """
+    df, x, y = _points_to_coordinates(df)
+    with stage('assign', rows_in=len(df)) as s:
+        if clip is not None:
+            inside = points_in_clip(x, y, clip)
+            df, x, y = df.loc[inside], np.asarray(x)[inside], np.asarray(y)[inside]
+        s.set(rows_out=len(df))
+        return df, nearest_site(sites.x, sites.y, x, y, n_jobs=n_jobs)
+
 
-def _df_to_boundaries(df: pd.DataFrame, boundaries: GeoDataFrame, aggfunc=np.sum):
+def _voronoi_boundaries(points: GeoDataFrame, clip=None):
+    """Replace the point geometry of the points with their voronoi cells"""
+    with stage('voronoi', rows_in=len(points)):
+        polygons = coords_to_voronoi_polygons(points.geometry.x, points.geometry.y, clip=clip)
+        return points.set_geometry(polygons)
+
+
+def _df_to_boundaries(df: pd.DataFrame, boundaries: GeoDataFrame, aggfunc=np.sum, n_jobs=1, cache_dir=None):
     """
     Aggreggates point data to the corresponding polygon boundaries 
     Parameters
@@ -178,17 +672,139 @@ def _df_to_boundaries(df: pd.DataFrame, boundaries: GeoDataFrame, aggfunc=np.sum
     df : pd.DataFrame of lat/long data to be aggregated, or GeoDataFrame with valid point geometry
     boundaries : GeoSeries of polygon geometry
     aggfunc : function, str, list or dict to aggregate numeric cols to polygon as per pd.DataFrame.agg(aggfunc)
+    n_jobs : number of processes to shard the points across, -1 for all cpus. Default of 1 runs in the current process
+    cache_dir : directory to persist the assignment of points to polygons in, which is reused by later calls with the same
+                points and boundaries, see _join_boundaries
+
+    Returns
+    -------
+    PorygonDataFrame of the dataframe aggregated to polygon, with index 'id' of the boundaries's 'id' index
+    """
+    if cache_dir is not None:
+        return _join_boundaries(df, boundaries, n_jobs=n_jobs, cache_dir=cache_dir).aggregate(aggfunc)
+
+    srs = _validate_boundaries(boundaries)
+    assign = _BoundaryAssign(srs.values)
+    build = partial(_positions_aggregate_to_porygon, boundaries=boundaries)
+
+    if n_jobs == 1:
+        df, aggregate = _aggregate_points(*assign(df), aggfunc)
+    else:
+        df, x, y = _points_to_coordinates(df)
+        with stage('parallel_aggregate', rows_in=len(df)) as s:
+            df = parallel_boundary_aggregate(x, y, df, srs.values, aggfunc, n_jobs=n_jobs, as_partial=True)
+            s.set(rows_out=len(df.state if isinstance(df, PartialAggregate) else df))
+        df, aggregate = (df.result(), df) if isinstance(df, PartialAggregate) else (df, None)
+
+    return _attach_aggregate(build(df), aggregate, assign, build)
+
+
+def _join_boundaries(df: pd.DataFrame, boundaries: GeoDataFrame, n_jobs=1, cache_dir=None):
+    """
+    Assign point data to the polygon boundaries containing each point
+    Parameters
+    ----------
+    df : pd.DataFrame of lat/long data, or GeoDataFrame with valid point geometry
+    boundaries : GeoSeries of polygon geometry
+    n_jobs : number of processes to shard the points across, -1 for all cpus. Default of 1 runs in the current process
+    cache_dir : directory to persist the assignment in, as a .npz file named by the hash of the point coordinates and boundary geometry.
+                If the same points were already assigned to the same boundaries, the assignment is loaded instead
+
+    Returns
+    -------
+    BoundaryJoin
+    """
+    srs = _validate_boundaries(boundaries)
+    df, x, y = _points_to_coordinates(df)
+
+    key = assignment_key(x, y, srs.values)
+    path = None if cache_dir is None else Path(cache_dir, f'{key}.npz')
+    if path is not None and path.exists():
+        with stage('load_assignment', rows_in=len(df)):
+            return BoundaryJoin(df, boundaries, PolygonAssignment.load(path))
+
+    with stage('assign', rows_in=len(df)):
+        if n_jobs == 1:
+            positions = PolygonIndex(srs.values).query(shapely.points(x, y))
+        else:
+            positions = parallel_points_in_polygons(x, y, srs.values, n_jobs=n_jobs)
+    assignment = PolygonAssignment(positions, key)
+
+    if path is not None:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        assignment.save(path)
+    return BoundaryJoin(df, boundaries, assignment)
+
+
+class BoundaryJoin:
+    """
+    Point data joined to the polygon boundaries containing each point, so that it can be aggregated many times with a plain groupby
+    e.g. join = PorygonDataFrame().join_boundaries(df, boundaries); join.aggregate('sum'); join.aggregate('mean', columns=['count'])
+    Parameters
+    ----------
+    df : pd.DataFrame of the point data without coordinates
+    boundaries : GeoDataFrame of polygon geometry
+    assignment : PolygonAssignment of each point to the boundaries
+    """
+
+    def __init__(self, df: pd.DataFrame, boundaries: GeoDataFrame, assignment: PolygonAssignment):
+        assert len(df) == len(assignment.positions), 'assignment does not match the point data'
+        self.df = df
+        self.boundaries = boundaries
+        self.assignment = assignment
+        self._assign = _BoundaryAssign(_validate_boundaries(boundaries).values)
+
+    def aggregate(self, aggfunc=np.sum, columns=None):
+        """
+        Aggregate the point data to the boundaries
+        Parameters
+        ----------
+        aggfunc : function, str, list or dict to aggregate numeric cols to polygon as per pd.DataFrame.agg(aggfunc)
+        columns : subset of the columns to aggregate. Default is all columns
+
+        Returns
+        -------
+        PorygonDataFrame of the dataframe aggregated to polygon, with index 'id' of the boundaries's 'id' index
+        """
+        df = self.df if columns is None else self.df[columns]
+        positions = self.assignment.positions
+        matched = positions >= 0
+        df, aggregate = _aggregate_points(df[matched], positions[matched], aggfunc)
+
+        build = partial(_positions_aggregate_to_porygon, boundaries=self.boundaries)
+        return _attach_aggregate(build(df), aggregate, self._assign, build)
+
+
+def _chunks_to_boundaries(chunks, boundaries: GeoDataFrame, aggfunc=np.sum):
+    """
+    Streaming version of _df_to_boundaries, that aggregates an iterable of point data chunks
+    Only partial aggregates are kept between chunks, so memory scales with the number of polygons rather than points
+    Parameters
+    ----------
+    chunks : iterable of pd.DataFrame or GeoDataFrame point data, e.g. pd.read_csv(..., chunksize=...)
+    boundaries : GeoSeries of polygon geometry
+    aggfunc : mergeable aggregation(s) 'sum', 'count', 'mean', 'min', 'max' as a str, function, list or dict as per pd.DataFrame.agg(aggfunc)
 
     Returns
     -------
     PorygonDataFrame of the dataframe aggregated to polygon, with index 'id' of the boundaries's 'id' index
     """
-    # Validate df
-    df = _validate_point_data(df)
-    if not isinstance(df, GeoDataFrame):
-        df = df_to_gpdf(df)
+    srs = _validate_boundaries(boundaries)
+    assign = _BoundaryAssign(srs.values)
+    build = partial(_positions_aggregate_to_porygon, boundaries=boundaries)
 
-    # Validate boundaries
+    aggregate = PartialAggregate(aggfunc)
+    for df in chunks:
+        with stage('chunk', rows_in=len(df)):
+            df, keys = assign(df)
+            with stage('aggregate', rows_in=len(df)):
+                aggregate.update(df, keys)
+
+    return _attach_aggregate(build(aggregate.result()), aggregate, assign, build)
+
+
+def _validate_boundaries(boundaries: GeoDataFrame):
+    """Validate the boundaries index and return their polygon geometry as a GeoSeries"""
     assert boundaries.index.is_unique, 'PorygonDataFrame requires a unique index'
     assert type(boundaries.index) != pd.MultiIndex, 'PorygonDataFrame does not support MultiIndex'
     if boundaries.index.name != 'id':
@@ -200,16 +816,67 @@ def _df_to_boundaries(df: pd.DataFrame, boundaries: GeoDataFrame, aggfunc=np.sum
     else: 
         srs = boundaries['geometry']
 
-    df = _assign_polygon_index(df, srs)
+    return srs
 
-    df = df.drop(columns='geometry').groupby('id').agg(aggfunc).reset_index()
-    
-    gpdf = pd.merge(df.reset_index(), boundaries, on='id') 
-    
-    return PorygonDataFrame(gpdf.set_index('id')) 
+
+def _points_to_boundary_positions(df: pd.DataFrame, index: PolygonIndex):
+    """Validate point data and return the data without coordinates of the points within a polygon, and the position of their polygon"""
+    df, x, y = _points_to_coordinates(df)
+    with stage('assign', rows_in=len(df)) as s:
+        positions = index.query(shapely.points(x, y))
+        matched = positions >= 0
+        s.set(rows_out=int(matched.sum()))
+
+    return df[matched], positions[matched]
+
+
+class _BoundaryAssign:
+    """
+    Function of point data to the data without coordinates of the points within a polygon, and the position of their polygon,
+    see _points_to_boundary_positions. The PolygonIndex is built the first time points are assigned, e.g. by update_points, and then kept
+    """
+
+    def __init__(self, polygons):
+        self.polygons = polygons
+        self.index = None
+
+    def __call__(self, df: pd.DataFrame):
+        if self.index is None:
+            self.index = PolygonIndex(self.polygons)
+        return _points_to_boundary_positions(df, self.index)
+
+
+def _positions_aggregate_to_porygon(df: pd.DataFrame, boundaries: GeoDataFrame):
+    """Given a dataframe aggregated to the positions of the boundaries, join the boundary geometry and return a PorygonDataFrame"""
+    df.index = boundaries.index[df.index.values]
+    return _boundaries_aggregate_to_porygon(df, boundaries)
+
+
+def _boundaries_aggregate_to_porygon(df: pd.DataFrame, boundaries: GeoDataFrame):
+    """Given a dataframe aggregated to the 'id' index of the boundaries, join the boundary geometry and return a PorygonDataFrame"""
+    # ids of points outside every polygon were NaN, which casts integer ids to float
+    df.index = df.index.astype(boundaries.index.dtype)
+    with stage('merge', rows_in=len(df)):
+        gpdf = pd.merge(df.sort_index().reset_index(), boundaries, on='id') 
+
+    with stage('construct', rows_in=len(gpdf)):
+        return PorygonDataFrame(gpdf.set_index('id')) 
     
 
-def _df_to_h3(df, h3_level=8, aggfunc=np.sum):
+def _k_ring_smooth_df(df, cols, k_ring_distances, k=1, weights=None, how='mean'):
+    """Copy of df with the cols smoothed over the k-ring of each cell, given the k-ring distances of its rows"""
+    if cols is None:
+        cols = [c for c in df.columns if is_numeric_dtype(df[c])]
+    cols = [cols] if isinstance(cols, str) else list(cols)
+    with stage('smooth', rows_in=len(df)) as s:
+        smoothed = k_ring_smooth(df[cols].to_numpy(dtype='float64'), k_ring_distances, k, weights, how)
+        s.set(pairs=len(k_ring_distances[0]))
+    df = df.copy()
+    df[cols] = smoothed
+    return df
+
+
+def _df_to_h3(df, h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
     """
     Aggregates point data to corresponding h3 polygons 
     For more on h3 see https://uber.github.io/h3/#/
@@ -218,28 +885,173 @@ def _df_to_h3(df, h3_level=8, aggfunc=np.sum):
     df : pd.DataFrame of lat/long data to be aggregated, or GeoDataFrame with valid point geometry
     h3_level : resolution of h3_tiles. Default is arbitrary
     aggfunc : function, str, list or dict to aggregate numeric cols to h3 tile as per pd.DataFrame.agg(aggfunc)
+    chunksize : number of points indexed per batch
+    n_jobs : number of processes to shard the points across, -1 for all cpus. Default of 1 runs in the current process
 
     Returns
     -------
-    H3DataFrame of the dataframe aggregated to h3 tiles, with index 'id' of h3 tile code
+    PorygonDataFrame of the dataframe aggregated to h3 tiles, with index 'id' of h3 tile code
     """
-    df = _validate_point_data(df)
+    df, aggregate = _df_to_h3_cells(df, h3_level, aggfunc, chunksize, n_jobs)
+    assign = partial(_points_to_h3_cells, h3_level=h3_level, chunksize=chunksize)
 
-    if isinstance(df, GeoDataFrame):
-        df = gpdf_to_latlong_df(df)
+    return _attach_aggregate(_h3_aggregate_to_porygon(df), aggregate, assign, _h3_aggregate_to_porygon)
 
-    # Utility for h3.geo_to_h3 to work on dataframe row
-    lat_lng_to_h3 = lambda row, h3_level: h3.geo_to_h3(row['latitude'], row['longitude'], h3_level)
-    df['id'] = df.apply(lat_lng_to_h3, args=(h3_level, ), axis=1)
 
-    df = df.drop(columns=['latitude', 'longitude'])
-    df = df.groupby('id').agg(aggfunc).reset_index()  
-    
-    # Utilty for for h3.h3_to_geo_boundary to return shapely.geometry.Polygon
-    h3_to_polygon = lambda h3_address: Polygon(h3.h3_to_geo_boundary(h3_address, geo_json=True)) 
-    df['geometry'] = df.id.apply(h3_to_polygon)
-    
-    return PorygonDataFrame(df.set_index('id')) 
+def _df_to_h3_cells(df, h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+    """
+    As per _df_to_h3, but returns a pd.DataFrame indexed by uint64 h3 cells without building polygons,
+    and the PartialAggregate it was computed from if aggfunc is mergeable (otherwise None)
+    """
+    # Cells are kept as uint64 through the groupby, and only converted to strings for the aggregated output
+    if n_jobs == 1:
+        return _aggregate_points(*_points_to_h3_cells(df, h3_level, chunksize=chunksize), aggfunc)
+
+    df, x, y = _points_to_coordinates(df)
+    with stage('parallel_aggregate', rows_in=len(df)) as s:
+        df = parallel_h3_aggregate(y, x, df, h3_level, aggfunc, n_jobs=n_jobs, chunksize=chunksize, as_partial=True)
+        s.set(rows_out=len(df.state if isinstance(df, PartialAggregate) else df))
+    return (df.result(), df) if isinstance(df, PartialAggregate) else (df, None)
+
+
+def _chunks_to_h3(chunks, h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+    """
+    Streaming version of _df_to_h3, that aggregates an iterable of point data chunks
+    Only partial aggregates are kept between chunks, so memory scales with the number of h3 tiles rather than points
+    Parameters
+    ----------
+    chunks : iterable of pd.DataFrame or GeoDataFrame point data, e.g. pd.read_csv(..., chunksize=...)
+    h3_level : resolution of h3_tiles
+    aggfunc : mergeable aggregation(s) 'sum', 'count', 'mean', 'min', 'max' as a str, function, list or dict as per pd.DataFrame.agg(aggfunc)
+    chunksize : number of points indexed per batch within each chunk
+    n_jobs : number of processes used to index the batches
+
+    Returns
+    -------
+    PorygonDataFrame of the dataframe aggregated to h3 tiles, with index 'id' of h3 tile code
+    """
+    aggregate = _chunks_to_h3_cells(chunks, h3_level, aggfunc, chunksize, n_jobs)
+    assign = partial(_points_to_h3_cells, h3_level=h3_level, chunksize=chunksize, n_jobs=n_jobs)
+
+    return _attach_aggregate(_h3_aggregate_to_porygon(aggregate.result()), aggregate, assign, _h3_aggregate_to_porygon)
+
+
+def _chunks_to_h3_cells(chunks, h3_level=8, aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+    """As per _chunks_to_h3, but returns the PartialAggregate of the chunks indexed by uint64 h3 cells, without building polygons"""
+    aggregate = PartialAggregate(aggfunc)
+    for df in chunks:
+        with stage('chunk', rows_in=len(df)):
+            df, cells = _points_to_h3_cells(df, h3_level, chunksize=chunksize, n_jobs=n_jobs)
+            with stage('aggregate', rows_in=len(df)):
+                aggregate.update(df, cells)
+
+    return aggregate
+
+
+def _df_to_h3_pyramid(df, h3_levels=(6, 7, 8, 9, 10), aggfunc=np.sum, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+    """
+    Aggregates point data to h3 polygons at several resolutions
+    Points are only indexed at the finest resolution, and coarser levels are rolled up from the aggregates of their child cells,
+    so each extra level costs on the order of the number of cells rather than points.
+    Since h3 children don't exactly tile their parent, points near a cell edge can roll up to a neighbour of the cell from_h3 would assign.
+    Parameters
+    ----------
+    df : pd.DataFrame of lat/long data to be aggregated, or GeoDataFrame with valid point geometry
+    h3_levels : iterable of h3 resolutions
+    aggfunc : mergeable aggregation(s) 'sum', 'count', 'mean', 'min', 'max' as a str, function, list or dict as per pd.DataFrame.agg(aggfunc)
+    chunksize : number of points indexed per batch
+    n_jobs : number of processes used to index the batches
+
+    Returns
+    -------
+    dict of h3 level to PorygonDataFrame of the dataframe aggregated to h3 tiles, with index 'id' of h3 tile code
+    """
+    h3_levels = sorted(set(h3_levels), reverse=True)
+    assert len(h3_levels) > 0, 'h3_levels must contain at least one resolution'
+
+    df, cells = _points_to_h3_cells(df, h3_levels[0], chunksize=chunksize, n_jobs=n_jobs)
+    with stage('aggregate', rows_in=len(df)):
+        aggregate = PartialAggregate(aggfunc).update(df, cells)
+
+    pyramid = {}
+    for i, h3_level in enumerate(h3_levels):
+        if i > 0:
+            # each level is rolled up from the previous, finer level
+            with stage('regroup', rows_in=len(aggregate.state)):
+                aggregate = aggregate.regroup(h3_to_parent(aggregate.state.index.values, h3_level))
+        assign = partial(_points_to_h3_cells, h3_level=h3_level, chunksize=chunksize, n_jobs=n_jobs)
+        pyramid[h3_level] = _attach_aggregate(_h3_aggregate_to_porygon(aggregate.result()), aggregate, assign, _h3_aggregate_to_porygon)
+
+    return pyramid
+
+
+def _points_to_h3_cells(df, h3_level, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+    """Validate point data and return the data without coordinates, and the uint64 h3 cell of each point"""
+    df, x, y = _points_to_coordinates(df)
+    with stage('assign', rows_in=len(df)):
+        cells = latlong_to_h3(y, x, h3_level, chunksize=chunksize, n_jobs=n_jobs)
+
+    return df, cells
+
+
+def _points_to_coordinates(df):
+    """Validate point data and return the data without coordinates, and arrays of the longitude and latitude of each point"""
+    with stage('validate', rows_in=len(df)) as s:
+        df = _validate_point_data(df)
+        s.set(rows_out=len(df))
+
+        if isinstance(df, GeoDataFrame):
+            return pd.DataFrame(df.drop(columns=df.geometry.name)), df.geometry.x.values, df.geometry.y.values
+
+        return df.drop(columns=['latitude', 'longitude']), df['longitude'].values, df['latitude'].values
+
+
+def _h3_aggregate_to_porygon(df, polygons=None):
+    """
+    Given a dataframe indexed by uint64 h3 cells, build the hexagon of each cell and return a PorygonDataFrame indexed by h3 tile code
+    polygons can be provided if the hexagons of the cells were already built
+    """
+    cells = df.index.values
+    df = pd.DataFrame(df).reset_index(drop=True)
+    with stage('build', rows_in=len(df)):
+        df['geometry'] = h3_to_polygons(cells) if polygons is None else polygons
+        df['id'] = h3_to_str(cells)
+
+    # h3 tile codes are a unique string index and hexagons are valid polygons, so no need to validate
+    with stage('construct', rows_in=len(df)):
+        return PorygonDataFrame._from_trusted(df.set_index('id'))
+
+
+def _aggregate_points(df: pd.DataFrame, keys, aggfunc=np.sum):
+    """
+    Aggregate point data by the key of each point (e.g. the h3 cell or polygon position)
+    Returns
+    -------
+    pd.DataFrame of the aggregated values, and the PartialAggregate it was computed from if aggfunc is mergeable, otherwise None
+    """
+    with stage('aggregate', rows_in=len(df)) as s:
+        if is_mergeable(aggfunc):
+            aggregate = PartialAggregate(aggfunc).update(df, keys)
+            result = aggregate.result()
+        else:
+            result, aggregate = df.groupby(keys).agg(aggfunc), None
+        s.set(rows_out=len(result))
+    return result, aggregate
+
+
+def _attach_aggregate(pdf: PorygonDataFrame, aggregate: PartialAggregate, assign, build):
+    """
+    Keep the mergeable aggregate state a PorygonDataFrame was built from, so it can be updated with new points, see update_points
+    Parameters
+    ----------
+    pdf : PorygonDataFrame built from the aggregate
+    aggregate : PartialAggregate of the points, or None if the aggfunc isn't mergeable
+    assign : function of point data to the data without coordinates and the key of each point, as per the aggregate
+    build : function of the aggregated values (as per PartialAggregate.result) to a PorygonDataFrame
+    """
+    if aggregate is not None:
+        object.__setattr__(pdf, '_aggregate_state', (aggregate, assign, build))
+    return pdf
 
 
 def _assign_polygon_index(gpdf: GeoDataFrame, polygons: GeoSeries):
@@ -255,10 +1067,10 @@ def _assign_polygon_index(gpdf: GeoDataFrame, polygons: GeoSeries):
     -------
     gpdf  : GeoDataFrame with additional column 'id' which corresponds to the index of the polygon containing the point geometry
     """
+    positions = points_in_polygons(gpdf.geometry.values, polygons.values)
+    matched = positions >= 0
+    # Points outside every polygon are left as NaN
+    ids = pd.Series(polygons.index[positions[matched]], index=np.flatnonzero(matched))
+    gpdf['id'] = ids.reindex(np.arange(len(gpdf))).values
 
-    for i in polygons.index:
-        gpdf.loc[gpdf.geometry.within(polygons.loc[i]), 'id'] = i
-        # NOTE - I did try the below vectorization and it was 5X slower...
-        # shapely.vectorized.contains(polygons.loc[i], gpdf.geometry.x, gpdf.geometry.y)
-   
     return gpdf
@@ -1,2 +1,4 @@
 from porygon.utils.data import _validate_point_data, df_to_gpdf, gpdf_to_latlong_df
-from porygon.utils.voronoi import coords_to_voronoi_polygons
\ No newline at end of file
+from porygon.utils.voronoi import coords_to_voronoi_polygons, nearest_site, points_in_clip
+from porygon.utils.hexagons import latlong_to_h3, h3_to_parent, h3_get_resolution, h3_to_str, h3_to_polygons, str_to_h3, h3_k_ring_distances, k_ring_smooth
+from porygon.utils.sketches import Sketch, HyperLogLog, TDigest
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+from porygon.utils.sketches import Sketch
+
+# Statistics kept per polygon for each mergeable aggregation
+_AGGFUNC_STATS = {
+    'sum': ['sum'],
+    'count': ['count'],
+    'mean': ['sum', 'count'],
+    'min': ['min'],
+    'max': ['max'],
+}
+# How partial statistics of the same polygon are combined
+_STAT_MERGE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+_FUNC_NAMES = {np.sum: 'sum', np.mean: 'mean', np.min: 'min', np.max: 'max', sum: 'sum', min: 'min', max: 'max'}
+
+
+def _aggfunc_name(func):
+    """Name of a mergeable aggregation function, or None if it can't be computed from partial aggregates"""
+    if isinstance(func, Sketch):
+        return func.name
+    if isinstance(func, str):
+        return func if func in _AGGFUNC_STATS else None
+    try:
+        return _FUNC_NAMES.get(func)
+    except TypeError:  # unhashable
+        return None
+
+
+def _aggfunc_list(funcs):
+    return list(funcs) if isinstance(funcs, (list, tuple)) else [funcs]
+
+
+def is_mergeable(aggfunc):
+    """Whether aggfunc (as per pd.DataFrame.agg) can be computed exactly from mergeable partial aggregates"""
+    if isinstance(aggfunc, dict):
+        funcs = [f for v in aggfunc.values() for f in _aggfunc_list(v)]
+    else:
+        funcs = _aggfunc_list(aggfunc)
+    return len(funcs) > 0 and all(_aggfunc_name(f) is not None for f in funcs)
+
+
+class PartialAggregate:
+    """
+    Mergeable per-polygon aggregate state, from which sum, count, mean, min and max are computed exactly,
+    and approximate aggregations such as distinct counts and quantiles from Sketch states.
+    Partial aggregates of separate chunks of points can be merged, so memory scales with the number of polygons rather than points.
+    Parameters
+    ----------
+    aggfunc : str, function, list or dict of the mergeable aggregations 'sum', 'count', 'mean', 'min' and 'max' (or numpy equivalents),
+              or Sketch instances e.g. HyperLogLog() or TDigest(0.95)
+    """
+
+    def __init__(self, aggfunc=np.sum):
+        assert is_mergeable(aggfunc), f'aggfunc {aggfunc} cannot be computed from partial aggregates - use {list(_AGGFUNC_STATS)} or a Sketch'
+        self.aggfunc = aggfunc
+        self.columns = None
+        self.state = None  # pd.DataFrame indexed by polygon id, with (column, statistic) columns
+        func_lists = [_aggfunc_list(v) for v in aggfunc.values()] if isinstance(aggfunc, dict) else [_aggfunc_list(aggfunc)]
+        self.sketches = {}
+        for funcs in func_lists:
+            names = [_aggfunc_name(f) for f in funcs]
+            assert len(set(names)) == len(names), f'Aggregations of the same column must have unique names - got {names}'
+            for f in funcs:
+                if isinstance(f, Sketch):
+                    other = self.sketches.setdefault(f.name, f)
+                    assert type(other) is type(f) and vars(other) == vars(f), \
+                        f'Differently configured sketches share the name {f.name} - give them distinct names, e.g. sketch.name = ...'
+
+    def _spec(self):
+        """List of (column, [aggregation names]), and whether the result has (column, aggregation) MultiIndex columns"""
+        if isinstance(self.aggfunc, dict):
+            spec = [(col, [_aggfunc_name(f) for f in _aggfunc_list(funcs)]) for col, funcs in self.aggfunc.items()]
+            multi = any(isinstance(funcs, (list, tuple)) for funcs in self.aggfunc.values())
+        elif isinstance(self.aggfunc, (list, tuple)):
+            spec = [(col, [_aggfunc_name(f) for f in self.aggfunc]) for col in self.columns]
+            multi = True
+        else:
+            spec = [(col, [_aggfunc_name(self.aggfunc)]) for col in self.columns]
+            multi = False
+        return spec, multi
+
+    def _stats(self):
+        """Dict of column to the statistics needed to compute its aggregations"""
+        spec, _ = self._spec()
+        stats = {}
+        for col, names in spec:
+            stats[col] = sorted({stat for name in names for stat in _AGGFUNC_STATS.get(name, [name])})
+        return stats
+
+    def update(self, df: pd.DataFrame, by):
+        """
+        Fold a chunk of points into the aggregate state
+        Parameters
+        ----------
+        df : pd.DataFrame of the value columns to aggregate
+        by : polygon id of each row, as per pd.DataFrame.groupby(by). Rows with a missing id are dropped
+        """
+        if self.columns is None:
+            self.columns = df.columns.tolist()
+        assert df.columns.tolist() == self.columns, f'Columns {df.columns.tolist()} do not match previous chunks {self.columns}'
+        stats = self._stats()
+        exact = {col: [s for s in col_stats if s not in self.sketches] for col, col_stats in stats.items()}
+        exact = {col: col_stats for col, col_stats in exact.items() if col_stats}
+        parts = [df.groupby(by).agg(exact)] if exact else []
+        parts += [self.sketches[s].sketch(df[col], by).rename((col, s)) for col, col_stats in stats.items() for s in col_stats if s in self.sketches]
+        columns = pd.MultiIndex.from_tuples([(col, s) for col, col_stats in stats.items() for s in col_stats])
+        return self._merge_state(pd.concat(parts, axis=1)[columns])
+
+    def merge(self, other):
+        """Merge the state of another PartialAggregate of the same aggfunc into this one"""
+        if other.state is None:
+            return self
+        if self.columns is None:
+            self.columns = other.columns
+        return self._merge_state(other.state)
+
+    def _merge_state(self, partial: pd.DataFrame):
+        if self.state is None:
+            self.state = partial
+        else:
+            combined = pd.concat([self.state, partial])
+            self.state = _combine_stats(combined, combined.index, self.sketches)
+        return self
+
+    def regroup(self, by):
+        """
+        Roll the state up to coarser polygons, e.g. h3 parent cells, without revisiting the points
+        Parameters
+        ----------
+        by : coarser polygon id of each polygon in the state, as per pd.DataFrame.groupby(by)
+
+        Returns
+        -------
+        PartialAggregate of the same aggfunc, aggregated to the coarser polygons
+        """
+        regrouped = PartialAggregate(self.aggfunc)
+        regrouped.columns = self.columns
+        if self.state is not None:
+            regrouped.state = _combine_stats(self.state, by, self.sketches)
+        return regrouped
+
+    def result(self):
+        """The aggregated values of each polygon, as per pd.DataFrame.groupby(by).agg(aggfunc) over all the folded points"""
+        spec, multi = self._spec()
+        if self.state is None:
+            return pd.DataFrame()
+
+        out = {}
+        for col, names in spec:
+            for name in names:
+                if name == 'mean':
+                    values = self.state[(col, 'sum')] / self.state[(col, 'count')]
+                elif name in self.sketches:
+                    # keys without any values have no state, e.g. polygons whose points are all missing the column
+                    values = self.state[(col, name)].map(self.sketches[name].result, na_action='ignore').astype('float64')
+                else:
+                    values = self.state[(col, name)]
+                out[(col, name) if multi else col] = values
+
+        return pd.DataFrame(out, index=self.state.index)
+
+
+def _combine_stats(state: pd.DataFrame, by, sketches=None):
+    """Combine the partial statistics of the rows of state sharing the same key, merging the states of sketches"""
+    sketches = sketches or {}
+    grouped = state.groupby(by)
+    parts = []
+    for how in ('sum', 'min', 'max'):
+        cols = [c for c in state.columns if c[1] not in sketches and _STAT_MERGE[c[1]] == how]
+        if cols:
+            parts.append(getattr(grouped[cols], how)())
+    for c in state.columns:
+        if c[1] in sketches:
+            parts.append(pd.DataFrame({c: _merge_sketches(state[c], by, sketches[c[1]])}))
+    return pd.concat(parts, axis=1)[state.columns]
+
+
+def _merge_sketches(states: pd.Series, by, sketch):
+    """Merge the sketch states sharing the same key, per polygon rather than per point"""
+    grouped = states.groupby(by)
+    merged = []
+    for _, group in grouped:
+        group = group.dropna()  # missing states of keys without values in a chunk
+        merged.append(np.nan if len(group) == 0 else group.iloc[0] if len(group) == 1 else sketch.merge(group.values))
+    return pd.Series(merged, index=grouped.size().index, dtype=object)
@@ -1,10 +1,31 @@
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
 import pandas as pd
 import geopandas
 from geopandas import GeoDataFrame
 
+
+@contextmanager
+def _atomic_path(path):
+    """
+    Path of a temporary file beside path to write to, which is moved onto path once the block completes.
+    Readers never see a partially written file, and concurrent writers each replace path with a complete file
+    """
+    path = Path(path)
+    tmp = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
 def _validate_point_data(df: pd.DataFrame):
     """
-    Validates that data has valid point data, removes missingness. 
+    Validates that data has valid point data, removes missingness without modifying df. 
     Parameters
     ----------
     df : pd.DataFrame with latitude & longitude columns, or GeoDataFrame with valid point geometry
@@ -14,7 +35,7 @@ def _validate_point_data(df: pd.DataFrame):
     elif isinstance(df, pd.DataFrame): 
         assert all(c in df.columns for c in ['latitude', 'longitude']), 'latitude and longitude not found in columns'
         # TODO - throw warning if any missingness
-        df.dropna(subset=['latitude', 'longitude'], inplace=True)
+        df = df.dropna(subset=['latitude', 'longitude'])
     else: 
         raise ValueError(f'Data structure not recognized: {type(df)}')
 
@@ -0,0 +1,186 @@
+import warnings
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import shapely
+from h3 import h3
+from h3.api import numpy_int as h3_int
+
+from porygon.utils.jobs import _resolve_n_jobs
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # h3.unstable warns on import
+        from h3.unstable import vect as h3_vect
+except ImportError:  # older h3 releases without the vectorized api
+    h3_vect = None
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+
+def _geo_to_h3_chunk(lat, lng, h3_level):
+    """Index a single chunk of lat/long arrays to uint64 h3 cells"""
+    lat = np.ascontiguousarray(lat, dtype='float64')
+    lng = np.ascontiguousarray(lng, dtype='float64')
+    if h3_vect is not None:
+        return h3_vect.geo_to_h3(lat, lng, h3_level).astype('uint64')
+    return np.fromiter((h3_int.geo_to_h3(a, b, h3_level) for a, b in zip(lat, lng)), dtype='uint64', count=len(lat))
+
+
+def latlong_to_h3(lat, lng, h3_level=8, chunksize=DEFAULT_CHUNKSIZE, n_jobs=1):
+    """
+    Vectorized conversion of latitude & longitude arrays to h3 cells
+    Parameters
+    ----------
+    lat : array of latitudes
+    lng : array of longitudes
+    h3_level : resolution of h3 tiles
+    chunksize : number of points indexed per batch, bounds the size of intermediate arrays
+    n_jobs : number of processes to spread the batches across, -1 for all cpus. Default of 1 indexes in the current process
+
+    Returns
+    -------
+    cells : np.ndarray of h3 cells as uint64
+    """
+    lat = np.asarray(lat, dtype='float64')
+    lng = np.asarray(lng, dtype='float64')
+    assert lat.shape == lng.shape, 'latitude and longitude must be the same length'
+    assert chunksize > 0, 'chunksize must be positive'
+
+    cells = np.empty(len(lat), dtype='uint64')
+    bounds = [(i, min(i + chunksize, len(lat))) for i in range(0, len(lat), chunksize)]
+    n_jobs = min(_resolve_n_jobs(n_jobs), max(len(bounds), 1))
+
+    if n_jobs == 1:
+        for start, stop in bounds:
+            cells[start:stop] = _geo_to_h3_chunk(lat[start:stop], lng[start:stop], h3_level)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            chunks = executor.map(_geo_to_h3_chunk,
+                                  (lat[start:stop] for start, stop in bounds),
+                                  (lng[start:stop] for start, stop in bounds),
+                                  repeat(h3_level))
+            for (start, stop), chunk in zip(bounds, chunks):
+                cells[start:stop] = chunk
+
+    return cells
+
+
+def h3_to_parent(cells, h3_level):
+    """Vectorized conversion of an array of uint64 h3 cells to their parent cells at the coarser h3_level"""
+    cells = np.ascontiguousarray(cells, dtype='uint64')
+    if h3_vect is not None:
+        return h3_vect.h3_to_parent(cells, h3_level).astype('uint64')
+    return np.fromiter((h3_int.h3_to_parent(int(c), h3_level) for c in cells), dtype='uint64', count=len(cells))
+
+
+def h3_get_resolution(cells):
+    """Vectorized resolution of an array of uint64 h3 cells, read from bits 52-55 of the index"""
+    return ((np.asarray(cells, dtype='uint64') >> np.uint64(52)) & np.uint64(0xF)).astype('int64')
+
+
+def h3_to_str(cells):
+    """Convert an array of uint64 h3 cells to their hexadecimal string representation"""
+    return np.array([h3.h3_to_string(int(c)) for c in cells], dtype=object)
+
+
+def h3_to_polygons(cells):
+    """
+    Build the boundary polygon of each h3 cell
+    Callers should pass unique cells, since each boundary is computed once per element
+    Parameters
+    ----------
+    cells : array of uint64 h3 cells
+
+    Returns
+    -------
+    polygons : np.ndarray of shapely.Polygons, in the same order as cells
+    """
+    if len(cells) == 0:
+        return np.array([], dtype=object)
+    boundaries = [h3_int.h3_to_geo_boundary(int(c), geo_json=True) for c in cells]
+    coords = np.array([vertex for boundary in boundaries for vertex in boundary], dtype='float64').reshape(-1, 2)
+    ring_index = np.repeat(np.arange(len(boundaries)), [len(b) for b in boundaries])
+    rings = shapely.linearrings(coords, indices=ring_index)
+    return shapely.polygons(rings)
+
+
+def str_to_h3(ids):
+    """Convert an array of hexadecimal h3 tile codes to uint64 h3 cells"""
+    return np.array([int(i, 16) for i in ids], dtype='uint64')
+
+
+def h3_k_ring_distances(cells, k=1):
+    """
+    Pairs of cells within grid distance k of each other, including each cell with itself at distance 0
+    Neighbours that aren't in cells are dropped, so the pairs are a sparse adjacency of the cells
+    Parameters
+    ----------
+    cells : array of unique uint64 h3 cells
+    k : grid distance
+
+    Returns
+    -------
+    rows : position in cells of each cell
+    cols : position in cells of its neighbour
+    distances : grid distance between them
+    """
+    assert k >= 0, 'k must be non-negative'
+    cells = np.asarray(cells, dtype='uint64')
+    if len(cells) == 0:
+        empty = np.array([], dtype='int64')
+        return empty, empty, empty
+    # one call per cell, and everything after is vectorized over the flattened rings of every cell
+    rings = [ring for c in cells.tolist() for ring in h3_int.k_ring_distances(c, k)]
+    lengths = np.fromiter(map(len, rings), dtype='int64', count=len(rings))
+    neighbours = np.concatenate(rings)
+    distances = np.repeat(np.tile(np.arange(k + 1), len(cells)), lengths)
+    rows = np.repeat(np.arange(len(cells)), lengths.reshape(-1, k + 1).sum(axis=1))
+
+    from pandas import Index
+    cols = Index(cells).get_indexer(neighbours)
+    present = cols >= 0
+    return rows[present], cols[present], distances[present]
+
+
+def _k_ring_weights(distances, k, weights=None):
+    if weights is None:
+        return 1 - distances / (k + 1)  # linear decay, so the farthest ring still counts
+    if isinstance(weights, str):
+        assert weights == 'uniform', f"weights must be None, 'uniform', a sequence or a function - got {weights}"
+        return np.ones(len(distances))
+    if callable(weights):
+        return np.asarray(weights(distances), dtype='float64')
+    weights = np.asarray(weights, dtype='float64')
+    assert len(weights) == k + 1, f'weights must have one weight per ring, from 0 to k={k}'
+    return weights[distances]
+
+
+def k_ring_smooth(values, k_ring_distances, k=1, weights=None, how='mean'):
+    """
+    Distance-weighted sum or mean of the values of each cell's k-ring, as a sparse matrix product over all columns at once
+    Parameters
+    ----------
+    values : 2d array of the values of each cell (rows) and column
+    k_ring_distances : (rows, cols, distances) of the cells as per h3_k_ring_distances
+    k : grid distance the pairs were computed to
+    weights : weight of each grid distance. Default decays linearly from 1 at the cell to 1 / (k + 1) at ring k.
+              'uniform' weights every cell in the k-ring equally, or provide a sequence of k + 1 weights or a function of the distances
+    how : 'mean' for the weighted mean of the neighbours with values, or 'sum' for the weighted sum where missing values are 0
+
+    Returns
+    -------
+    np.ndarray of the smoothed values, the same shape as values
+    """
+    from scipy import sparse
+    assert how in ('mean', 'sum'), f"how must be 'mean' or 'sum' - got {how}"
+    values = np.asarray(values, dtype='float64')
+    rows, cols, distances = k_ring_distances
+    matrix = sparse.csr_matrix((_k_ring_weights(distances, k, weights), (rows, cols)), shape=(len(values), len(values)))
+
+    finite = np.isfinite(values)
+    total = matrix @ np.where(finite, values, 0)
+    if how == 'sum':
+        return total
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / (matrix @ finite.astype('float64'))
@@ -0,0 +1,11 @@
+import os
+
+
+def _resolve_n_jobs(n_jobs):
+    """Number of processes, where negative values count back from the number of cpus as in joblib (-1 is all cpus)"""
+    if n_jobs is None:
+        return 1
+    assert n_jobs != 0, 'n_jobs must be a positive or negative integer'
+    if n_jobs < 0:
+        return max(os.cpu_count() + 1 + n_jobs, 1)
+    return n_jobs
@@ -0,0 +1,96 @@
+import hashlib
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from porygon.utils.data import _atomic_path
+
+
+class PolygonIndex:
+    """
+    Bounding-box index over polygons for finding the polygon containing each of many points
+    Candidate (point, polygon) pairs are filtered in bulk with an STRtree, and the exact test is only run on those candidates
+    using prepared polygons. Build once and query repeatedly to reuse the index.
+    Parameters
+    ----------
+    polygons : array of shapely.Polygons or MultiPolygons
+    """
+
+    def __init__(self, polygons):
+        self.polygons = np.asarray(polygons, dtype=object)
+        self.tree = STRtree(self.polygons)
+        shapely.prepare(self.polygons)
+
+    def query(self, points):
+        """
+        Matches the semantics of point.within(polygon): points on a polygon's edge are not contained by it.
+        Parameters
+        ----------
+        points : array of shapely.Points
+
+        Returns
+        -------
+        positions : np.ndarray of the position of the polygon containing each point, -1 if no polygon contains it.
+                    If several polygons contain a point, the last one is returned.
+        """
+        points = np.asarray(points, dtype=object)
+        positions = np.full(len(points), -1, dtype='int64')
+        if len(points) == 0 or len(self.polygons) == 0:
+            return positions
+
+        point_idx, polygon_idx = self.tree.query(points)  # bounding box candidates only
+        contained = shapely.contains(self.polygons[polygon_idx], points[point_idx])
+        np.maximum.at(positions, point_idx[contained], polygon_idx[contained])
+
+        return positions
+
+
+def points_in_polygons(points, polygons):
+    """
+    Find the polygon containing each point, see PolygonIndex.query
+    Parameters
+    ----------
+    points : array of shapely.Points
+    polygons : array of shapely.Polygons or MultiPolygons
+
+    Returns
+    -------
+    positions : np.ndarray of the position of the polygon containing each point, -1 if no polygon contains it
+    """
+    return PolygonIndex(polygons).query(points)
+
+
+def assignment_key(x, y, polygons):
+    """Hash of point coordinates and polygon geometry, identifying the result of assigning the points to the polygons"""
+    x = np.ascontiguousarray(x, dtype='float64')
+    y = np.ascontiguousarray(y, dtype='float64')
+    h = hashlib.sha1(np.int64(len(x)).tobytes())
+    h.update(x.tobytes())
+    h.update(y.tobytes())
+    for wkb in shapely.to_wkb(np.asarray(polygons, dtype=object)):
+        h.update(wkb)
+    return h.hexdigest()
+
+
+class PolygonAssignment:
+    """
+    The position of the polygon containing each point, computed once so that it can be aggregated many times with a plain groupby
+    Parameters
+    ----------
+    positions : np.ndarray of the position of the polygon containing each point, -1 if no polygon contains it
+    key : assignment_key of the points and polygons the positions were computed from
+    """
+
+    def __init__(self, positions, key=None):
+        self.positions = np.asarray(positions, dtype='int64')
+        self.key = key
+
+    def save(self, path):
+        """Persist to a .npz file, which is written in full before it replaces any existing file"""
+        with _atomic_path(path) as tmp, open(tmp, 'wb') as f:
+            np.savez(f, positions=self.positions, key=np.array(self.key or ''))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['positions'], str(data['key']) or None)
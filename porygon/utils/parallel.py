@@ -0,0 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
+import shapely
+
+from porygon.utils.jobs import _resolve_n_jobs
+from porygon.utils.hexagons import latlong_to_h3, DEFAULT_CHUNKSIZE
+from porygon.utils.join import PolygonIndex
+from porygon.utils.aggregation import PartialAggregate, is_mergeable
+
+_worker_index = None  # PolygonIndex of the boundaries, built once in each worker process
+
+
+def _shard_bounds(n, n_jobs, chunksize):
+    """Split n rows into at least one shard per process, and shards of at most chunksize rows"""
+    n_shards = max(n_jobs, -(-n // chunksize), 1)
+    edges = np.linspace(0, n, n_shards + 1).astype('int64')
+    return [(start, stop) for start, stop in zip(edges[:-1], edges[1:]) if stop > start] or [(0, n)]
+
+
+def _shard_result(keys, values, aggfunc):
+    """Partial aggregate of the shard if aggfunc is mergeable, otherwise just the keys for the parent to group by"""
+    if values is None:
+        return keys
+    return PartialAggregate(aggfunc).update(values, keys)
+
+
+def _h3_shard(lat, lng, values, h3_level, aggfunc):
+    cells = latlong_to_h3(lat, lng, h3_level, chunksize=max(len(lat), 1))
+    return _shard_result(cells, values, aggfunc)
+
+
+def _init_boundary_worker(polygons_wkb):
+    global _worker_index
+    _worker_index = PolygonIndex(shapely.from_wkb(polygons_wkb))
+
+
+def _boundary_shard(x, y, values, aggfunc):
+    positions = _worker_index.query(shapely.points(x, y))
+    if values is None:
+        return positions
+    matched = positions >= 0
+    return _shard_result(positions[matched], values[matched], aggfunc)
+
+
+def _run_shards(fn, x, y, values, aggfunc, n_jobs, chunksize, args=(), initializer=None, initargs=()):
+    """
+    Run fn(x, y, values, *args, aggfunc) over shards of the points in a process pool
+    Values are only sent to the workers if aggfunc is mergeable, otherwise the workers just compute the key of each point.
+    Returns
+    -------
+    results : list of the PartialAggregate (if aggfunc is mergeable) or keys of each shard
+    """
+    n_jobs = _resolve_n_jobs(n_jobs)
+    bounds = _shard_bounds(len(x), n_jobs, chunksize)
+    mergeable = is_mergeable(aggfunc)
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=initializer, initargs=initargs) as executor:
+        return list(executor.map(fn,
+                                 (x[start:stop] for start, stop in bounds),
+                                 (y[start:stop] for start, stop in bounds),
+                                 (values.iloc[start:stop] if mergeable else None for start, stop in bounds),
+                                 *[repeat(arg) for arg in args],
+                                 repeat(aggfunc if mergeable else None)))
+
+
+def _merge_shards(results, aggfunc):
+    """Combine the partial aggregates of each shard"""
+    aggregate = PartialAggregate(aggfunc)
+    for result in results:
+        aggregate.merge(result)
+    return aggregate
+
+
+def parallel_h3_aggregate(lat, lng, values: pd.DataFrame, h3_level=8, aggfunc=np.sum, n_jobs=-1, chunksize=DEFAULT_CHUNKSIZE, as_partial=False):
+    """
+    Aggregate point data to h3 cells, with the points sharded across a process pool
+    Parameters
+    ----------
+    lat : array of latitudes
+    lng : array of longitudes
+    values : pd.DataFrame of the columns to aggregate, aligned with lat & lng
+    h3_level : resolution of h3 tiles
+    aggfunc : function, str, list or dict to aggregate numeric cols as per pd.DataFrame.agg(aggfunc).
+              Mergeable aggregations (sum, count, mean, min, max) are also computed in the workers.
+    n_jobs : number of processes, -1 for all cpus
+    chunksize : maximum number of points per shard
+    as_partial : return the merged PartialAggregate rather than its result, if aggfunc is mergeable
+
+    Returns
+    -------
+    pd.DataFrame of the values aggregated to h3 tiles, indexed by uint64 h3 cells
+    """
+    lat = np.asarray(lat, dtype='float64')
+    lng = np.asarray(lng, dtype='float64')
+    results = _run_shards(_h3_shard, lat, lng, values, aggfunc, n_jobs, chunksize, args=(h3_level, ))
+    if is_mergeable(aggfunc):
+        aggregate = _merge_shards(results, aggfunc)
+        return aggregate if as_partial else aggregate.result()
+
+    cells = np.concatenate(results)
+    return values.groupby(cells).agg(aggfunc)
+
+
+def parallel_boundary_aggregate(x, y, values: pd.DataFrame, polygons, aggfunc=np.sum, n_jobs=-1, chunksize=DEFAULT_CHUNKSIZE, as_partial=False):
+    """
+    Aggregate point data to the polygon containing each point, with the points sharded across a process pool
+    The polygons are sent to each worker once, where a PolygonIndex is built and reused for every shard.
+    Parameters
+    ----------
+    x : array of longitudes
+    y : array of latitudes
+    values : pd.DataFrame of the columns to aggregate, aligned with x & y
+    polygons : array of shapely.Polygons or MultiPolygons
+    aggfunc : function, str, list or dict to aggregate numeric cols as per pd.DataFrame.agg(aggfunc).
+              Mergeable aggregations (sum, count, mean, min, max) are also computed in the workers.
+    n_jobs : number of processes, -1 for all cpus
+    chunksize : maximum number of points per shard
+    as_partial : return the merged PartialAggregate rather than its result, if aggfunc is mergeable
+
+    Returns
+    -------
+    pd.DataFrame of the values aggregated to polygons, indexed by the position of the polygon. Points outside every polygon are dropped
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    polygons_wkb = shapely.to_wkb(np.asarray(polygons, dtype=object))
+    results = _run_shards(_boundary_shard, x, y, values, aggfunc, n_jobs, chunksize,
+                          initializer=_init_boundary_worker, initargs=(polygons_wkb, ))
+    if is_mergeable(aggfunc):
+        aggregate = _merge_shards(results, aggfunc)
+        return aggregate if as_partial else aggregate.result()
+
+    positions = np.concatenate(results)
+    matched = positions >= 0
+    return values[matched].groupby(positions[matched]).agg(aggfunc)
+
+
+def parallel_points_in_polygons(x, y, polygons, n_jobs=-1, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Find the polygon containing each point, with the points sharded across a process pool, see PolygonIndex.query
+    Returns
+    -------
+    positions : np.ndarray of the position of the polygon containing each point, -1 if no polygon contains it
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    polygons_wkb = shapely.to_wkb(np.asarray(polygons, dtype=object))
+    results = _run_shards(_boundary_shard, x, y, None, None, n_jobs, chunksize,
+                          initializer=_init_boundary_worker, initargs=(polygons_wkb, ))
+    return np.concatenate(results)
@@ -0,0 +1,73 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import GeometryType
+
+_GEOJSON_TYPES = {GeometryType.POLYGON: 'Polygon', GeometryType.MULTIPOLYGON: 'MultiPolygon'}
+
+
+def geometries_to_json(geometries, precision=6):
+    """
+    Serialize polygon geometries to GeoJSON geometry strings, straight from their coordinate arrays
+    Parameters
+    ----------
+    geometries : array of shapely.Polygons and MultiPolygons. Mixed arrays are all written as MultiPolygons
+    precision : number of decimals of the coordinates
+
+    Returns
+    -------
+    list of GeoJSON geometry strings
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    if len(geometries) == 0:
+        return []
+    geom_type, coords, offsets = shapely.to_ragged_array(geometries)
+    assert geom_type in _GEOJSON_TYPES, f'Only Polygon and MultiPolygon geometries are supported - got {geom_type.name}'
+    coords = coords.round(precision).tolist()
+
+    # Split the coordinates into rings, the rings into polygons, and for MultiPolygons the polygons into geometries
+    ring_offsets = offsets[0]
+    nested = [coords[start:stop] for start, stop in zip(ring_offsets[:-1], ring_offsets[1:])]
+    for level_offsets in offsets[1:]:
+        nested = [nested[start:stop] for start, stop in zip(level_offsets[:-1], level_offsets[1:])]
+
+    prefix = '{"type":"' + _GEOJSON_TYPES[geom_type] + '","coordinates":'
+    return [prefix + json.dumps(c, separators=(',', ':')) + '}' for c in nested]
+
+
+def write_feature_collection(ids, geometries_json, properties: pd.DataFrame, fp=None):
+    """
+    Write a GeoJSON FeatureCollection from pre-serialized geometries, without building intermediate Python dicts per feature
+    Parameters
+    ----------
+    ids : array of feature ids
+    geometries_json : list of GeoJSON geometry strings, as per geometries_to_json
+    properties : pd.DataFrame of the feature properties, aligned with ids
+    fp : writable text file object or path. If not provided, the GeoJSON is returned as a string
+
+    Returns
+    -------
+    GeoJSON string if fp is not provided
+    """
+    if fp is None:
+        buffer = io.StringIO()
+        write_feature_collection(ids, geometries_json, properties, buffer)
+        return buffer.getvalue()
+    if not hasattr(fp, 'write'):
+        with open(fp, 'w') as f:
+            return write_feature_collection(ids, geometries_json, properties, f)
+
+    if len(properties.columns) > 0 and len(properties) > 0:
+        # pandas writes one json object per row, with NaN as null
+        properties_json = properties.to_json(orient='records', lines=True, date_format='iso').splitlines()
+    else:
+        properties_json = ['{}'] * len(ids)
+
+    fp.write('{"type":"FeatureCollection","features":[')
+    for i, (id_, geometry, props) in enumerate(zip(ids, geometries_json, properties_json)):
+        if i > 0:
+            fp.write(',')
+        fp.write('{"type":"Feature","id":' + json.dumps(id_) + ',"properties":' + props + ',"geometry":' + geometry + '}')
+    fp.write(']}')
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+
+class Sketch:
+    """
+    Base class of approximate aggregations with a bounded size, mergeable state per polygon.
+    Instances can be used as an aggfunc (alone, in a list or dict) wherever mergeable aggregations are supported,
+    so partial states from separate chunks or processes are combined without revisiting the points.
+    """
+    name = 'sketch'
+
+    @property
+    def __name__(self):
+        # used by pandas to name the aggregated column when aggfunc is a list
+        return self.name
+
+    def sketch(self, values: pd.Series, keys):
+        """
+        Sketch values by key
+        Parameters
+        ----------
+        values : pd.Series of the values to sketch
+        keys : key of each value, e.g. h3 cell or polygon id. Missing keys and values are dropped
+
+        Returns
+        -------
+        pd.Series of the state of each key
+        """
+        raise NotImplementedError
+
+    def merge(self, states):
+        """Merge an iterable of states of the same key into one state"""
+        raise NotImplementedError
+
+    def result(self, state):
+        """The aggregated value of a state"""
+        raise NotImplementedError
+
+    def __call__(self, values):
+        """Aggregate a single group of values, as per pd.Series.agg"""
+        states = self.sketch(pd.Series(values), np.zeros(len(values)))
+        return self.result(states.iloc[0]) if len(states) else np.nan
+
+
+def _dropna(values: pd.Series, keys):
+    values = np.asarray(values)
+    keys = np.asarray(keys)
+    valid = pd.notna(values) & pd.notna(keys)
+    return values[valid], keys[valid]
+
+
+def _leading_zeros(x):
+    """Vectorized count of the leading zero bits of an array of uint64"""
+    x = x.copy()
+    n = np.zeros(len(x), dtype='int64')
+    for shift in (32, 16, 8, 4, 2, 1):
+        top_clear = x < (np.uint64(1) << np.uint64(64 - shift))
+        n[top_clear] += shift
+        x[top_clear] <<= np.uint64(shift)
+    n[x == 0] = 64
+    return n
+
+
+class HyperLogLog(Sketch):
+    """
+    Approximate distinct count, e.g. distinct vehicles per polygon, with a relative error of about 1.04 / sqrt(2^precision)
+    Parameters
+    ----------
+    precision : number of bits of the hash indexing the registers. Each polygon's state is 2^precision bytes
+    """
+
+    def __init__(self, precision=12):
+        assert 4 <= precision <= 18, 'precision must be between 4 and 18'
+        self.precision = precision
+        self.name = 'nunique_approx'
+
+    def sketch(self, values: pd.Series, keys):
+        values, keys = _dropna(values, keys)
+        codes, uniques = pd.factorize(keys)
+        hashes = pd.util.hash_array(values)
+
+        p = np.uint64(self.precision)
+        registers = (hashes >> (np.uint64(64) - p)).astype('int64')
+        ranks = np.minimum(_leading_zeros(hashes << p), 64 - self.precision) + 1
+
+        # registers are dense per key, so memory is bounded by the number of keys rather than values
+        states = np.zeros((len(uniques), 2 ** self.precision), dtype='uint8')
+        np.maximum.at(states, (codes, registers), ranks.astype('uint8'))
+        return pd.Series(list(states), index=uniques, dtype=object)
+
+    def merge(self, states):
+        return np.maximum.reduce(list(states))
+
+    def result(self, state):
+        m = len(state)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m ** 2 / np.sum(2.0 ** -state.astype('float64'))
+        zeros = np.count_nonzero(state == 0)
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * np.log(m / zeros)  # linear counting for small cardinalities
+        return estimate
+
+
+def _compress(codes, means, weights, compression):
+    """
+    Merge centroids sorted by code then mean into at most about compression / 2 centroids per code, using the t-digest k1 scale
+    so that centroids are smaller near the tails. Vectorized over all codes at once.
+    Returns the codes, means and weights of the merged centroids
+    """
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    totals = np.add.reduceat(weights, starts)
+    code_start = np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    cumulative = np.cumsum(weights)
+    before = cumulative[code_start] - weights[code_start]
+    q = (cumulative - before - weights / 2) / np.repeat(totals, np.diff(np.r_[starts, len(codes)]))
+
+    k = compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1))
+    bucket = np.floor(k + compression / 4).astype('int64')
+    groups = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (bucket[1:] != bucket[:-1])])
+
+    merged_weights = np.add.reduceat(weights, groups)
+    merged_means = np.add.reduceat(weights * means, groups) / merged_weights
+    return codes[groups], merged_means, merged_weights
+
+
+class TDigest(Sketch):
+    """
+    Approximate quantile, e.g. median or p95 per polygon, from a t-digest of at most about compression / 2 centroids per polygon.
+    Quantiles near the tails are the most accurate
+    Parameters
+    ----------
+    quantile : quantile to compute, between 0 and 1
+    compression : size of the digest, higher is more accurate
+    """
+
+    def __init__(self, quantile=0.5, compression=100):
+        assert 0 <= quantile <= 1, 'quantile must be between 0 and 1'
+        self.quantile = quantile
+        self.compression = compression
+        self.name = 'median_approx' if quantile == 0.5 else f'quantile_{quantile:g}_approx'
+
+    def sketch(self, values: pd.Series, keys):
+        values, keys = _dropna(values, keys)
+        codes, uniques = pd.factorize(keys)
+        if len(values) == 0:
+            return pd.Series([], index=uniques, dtype=object)
+        values = values.astype('float64')
+        order = np.lexsort((values, codes))
+
+        codes, means, weights = _compress(codes[order], values[order], np.ones(len(values)), self.compression)
+        splits = np.flatnonzero(np.diff(codes)) + 1
+        states = [np.column_stack(s) for s in zip(np.split(means, splits), np.split(weights, splits))]
+        return pd.Series(states, index=uniques, dtype=object)
+
+    def merge(self, states):
+        centroids = np.concatenate(list(states))
+        centroids = centroids[np.argsort(centroids[:, 0], kind='stable')]
+        _, means, weights = _compress(np.zeros(len(centroids), dtype='int64'), centroids[:, 0], centroids[:, 1], self.compression)
+        return np.column_stack([means, weights])
+
+    def result(self, state):
+        means, weights = state[:, 0], state[:, 1]
+        midpoints = np.cumsum(weights) - weights / 2
+        return float(np.interp(self.quantile * weights.sum(), midpoints, means))
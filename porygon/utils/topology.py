@@ -0,0 +1,200 @@
+import json
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import GeometryType
+
+
+def zoom_to_tolerance(zoom, pixels=1):
+    """Width in degrees of longitude of a number of pixels of a web map at the given zoom level"""
+    return 360 / (256 * 2 ** zoom) * pixels
+
+
+def _quantized_rings(geometries, precision=6, quantization=None):
+    """
+    Quantize the coordinates of every ring to an integer grid, with a spacing of 10^-precision or quantization steps across the extent
+    Returns
+    -------
+    q : np.ndarray of quantized coordinates of each ring, without the closing coordinate and consecutive duplicates
+    ring_offsets : offsets of each ring into q
+    polygon_offsets : offsets of each polygon into the rings
+    geometry_offsets : offsets of each geometry into the polygons
+    transform : TopoJSON transform from quantized to original coordinates
+    """
+    geom_type, coords, offsets = shapely.to_ragged_array(geometries)
+    assert geom_type in (GeometryType.POLYGON, GeometryType.MULTIPOLYGON), f'Only Polygon and MultiPolygon geometries are supported - got {geom_type.name}'
+    if geom_type == GeometryType.POLYGON:
+        ring_offsets, polygon_offsets = offsets
+        geometry_offsets = np.arange(len(polygon_offsets))
+    else:
+        ring_offsets, polygon_offsets, geometry_offsets = offsets
+
+    x0, y0 = coords.min(axis=0) if len(coords) else (0, 0)
+    x1, y1 = coords.max(axis=0) if len(coords) else (0, 0)
+    if quantization is None:
+        kx = ky = 10 ** precision
+    else:
+        kx = (quantization - 1) / (x1 - x0) if x1 > x0 else 1
+        ky = (quantization - 1) / (y1 - y0) if y1 > y0 else 1
+    q = np.round((coords - [x0, y0]) * [kx, ky]).astype('int64')
+
+    # Drop the closing coordinate of each ring, and coordinates that quantized onto the previous one
+    ring_id = np.repeat(np.arange(len(ring_offsets) - 1), np.diff(ring_offsets))
+    closing = np.zeros(len(q), dtype=bool)
+    closing[ring_offsets[1:] - 1] = True
+    duplicate = np.zeros(len(q), dtype=bool)
+    duplicate[1:] = (q[1:] == q[:-1]).all(axis=1) & (ring_id[1:] == ring_id[:-1])
+    keep = ~closing & ~duplicate
+    ring_offsets = np.concatenate([[0], np.cumsum(np.bincount(ring_id[keep], minlength=len(ring_offsets) - 1))])
+
+    transform = {'scale': [1 / kx, 1 / ky], 'translate': [float(x0), float(y0)]}
+    return q[keep], ring_offsets, polygon_offsets, geometry_offsets, transform
+
+
+def _junctions(keys, ring_offsets):
+    """
+    Whether each vertex is a junction, where the rings sharing it diverge
+    A vertex is a junction if it has different (unordered) pairs of neighbours in the rings it belongs to.
+    """
+    lengths = np.diff(ring_offsets)
+    starts = np.repeat(ring_offsets[:-1], lengths)
+    ring_lengths = np.repeat(lengths, lengths)
+    local = np.arange(len(keys)) - starts
+    prev_key = keys[starts + (local - 1) % ring_lengths]
+    next_key = keys[starts + (local + 1) % ring_lengths]
+
+    neighbours = pd.DataFrame({'key': keys, 'a': np.minimum(prev_key, next_key), 'b': np.maximum(prev_key, next_key)})
+    counts = neighbours.drop_duplicates()['key'].value_counts()
+    return np.isin(keys, counts.index[counts > 1].values)
+
+
+def _cut_arcs(keys, is_junction, ring_offsets):
+    """
+    Cut the rings into arcs at the junctions, and deduplicate arcs shared (in either direction) by neighbouring rings
+    Returns
+    -------
+    arcs : list of np.ndarray of the vertex positions of each unique arc
+    ring_arcs : list of the TopoJSON arc references of each ring, where ~i refers to arc i reversed
+    """
+    arcs, ring_arcs, lookup = [], [], {}
+
+    def reference(arc, canonical, canonical_reversed):
+        if canonical in lookup:
+            return lookup[canonical]
+        if canonical_reversed in lookup:
+            return ~lookup[canonical_reversed]
+        lookup[canonical] = len(arcs)
+        arcs.append(arc)
+        return lookup[canonical]
+
+    for start, stop in zip(ring_offsets[:-1], ring_offsets[1:]):
+        vertices = np.arange(start, stop)
+        junctions = np.flatnonzero(is_junction[start:stop])
+        if len(vertices) == 0:
+            ring_arcs.append([])
+        elif len(junctions) == 0:
+            # A ring without junctions is a single closed arc, rotated to start at its smallest vertex to compare rings
+            forward = np.roll(vertices, -np.argmin(keys[vertices]))
+            backward = forward[::-1]
+            backward = np.roll(backward, -np.argmin(keys[backward]))
+            arc = np.append(forward, forward[0])
+            ring_arcs.append([reference(arc, tuple(keys[forward]), tuple(keys[backward]))])
+        else:
+            vertices = np.roll(vertices, -junctions[0])
+            cuts = np.append(junctions - junctions[0], len(vertices))
+            closed = np.append(vertices, vertices[0])
+            refs = []
+            for a, b in zip(cuts[:-1], cuts[1:]):
+                arc = closed[a:b + 1]
+                canonical = tuple(keys[arc])
+                refs.append(reference(arc, canonical, canonical[::-1]))
+            ring_arcs.append(refs)
+
+    return arcs, ring_arcs
+
+
+def _simplify_arcs(arcs, q, tolerance):
+    """Douglas-Peucker simplification of each arc, keeping its end points so neighbouring polygons stay joined"""
+    lengths = np.array([len(arc) for arc in arcs])
+    lines = shapely.linestrings(q[np.concatenate(arcs)], indices=np.repeat(np.arange(len(arcs)), lengths))
+    simplified = shapely.simplify(lines, tolerance, preserve_topology=False)
+    coords, index = shapely.get_coordinates(simplified, return_index=True)
+    splits = np.split(coords.astype('int64'), np.flatnonzero(np.diff(index)) + 1)
+
+    # closed arcs (entire rings) need at least 4 coordinates to remain a ring, otherwise they are kept as is
+    simplified_arcs = []
+    for coords, arc in zip(splits, arcs):
+        min_length = 4 if arc[0] == arc[-1] else 2
+        simplified_arcs.append(coords if len(coords) >= min_length else q[arc])
+    return simplified_arcs
+
+
+def to_topology(geometries, precision=6, quantization=None, tolerance=None):
+    """
+    Encode polygon geometries as a TopoJSON-style topology, where borders shared by neighbouring polygons are stored once as arcs
+    Parameters
+    ----------
+    geometries : array of shapely.Polygons and MultiPolygons
+    precision : number of decimals of the coordinates on the quantized integer grid
+    quantization : number of distinct values of each coordinate on the quantized integer grid, instead of a fixed precision
+    tolerance : Douglas-Peucker tolerance, in units of the coordinates, to simplify each arc by. Since shared borders are
+                a single arc, the simplified polygons stay joined without gaps. Default doesn't simplify
+
+    Returns
+    -------
+    dict with the delta-encoded 'arcs', the 'transform', and the 'geometries' (type and arc references of each geometry)
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    types = ['MultiPolygon' if t == GeometryType.MULTIPOLYGON else 'Polygon' for t in shapely.get_type_id(geometries)]
+    if len(geometries) == 0:
+        return {'arcs': [], 'transform': {'scale': [1, 1], 'translate': [0, 0]}, 'geometries': []}
+
+    q, ring_offsets, polygon_offsets, geometry_offsets, transform = _quantized_rings(geometries, precision, quantization)
+    keys = q[:, 0] * (q[:, 1].max(initial=0) + 1) + q[:, 1]
+    arcs, ring_arcs = _cut_arcs(keys, _junctions(keys, ring_offsets), ring_offsets)
+
+    if tolerance:
+        arc_coords = _simplify_arcs(arcs, q, tolerance / transform['scale'][0])
+    else:
+        arc_coords = [q[arc] for arc in arcs]
+    # Delta-encode each arc from its first position
+    encoded = [np.concatenate([c[:1], np.diff(c, axis=0)]).tolist() for c in arc_coords]
+
+    polygon_arcs = [ring_arcs[a:b] for a, b in zip(polygon_offsets[:-1], polygon_offsets[1:])]
+    topology_geometries = []
+    for geom_type, a, b in zip(types, geometry_offsets[:-1], geometry_offsets[1:]):
+        polygons = polygon_arcs[a:b]
+        if geom_type == 'Polygon':
+            topology_geometries.append({'type': 'Polygon', 'arcs': polygons[0] if polygons else []})
+        else:
+            topology_geometries.append({'type': 'MultiPolygon', 'arcs': polygons})
+
+    return {'arcs': encoded, 'transform': transform, 'geometries': topology_geometries}
+
+
+def write_topojson(ids, topology: dict, properties: pd.DataFrame, object_name='porygon'):
+    """
+    Build a TopoJSON Topology from the output of to_topology
+    Parameters
+    ----------
+    ids : array of feature ids
+    topology : dict as per to_topology
+    properties : pd.DataFrame of the feature properties, aligned with ids
+    object_name : name of the GeometryCollection in the topology's objects
+
+    Returns
+    -------
+    dict of the TopoJSON Topology
+    """
+    if len(properties.columns) > 0 and len(properties) > 0:
+        records = json.loads(properties.to_json(orient='records', date_format='iso'))
+    else:
+        records = [{} for _ in ids]
+
+    geometries = [dict(geometry, id=str(id_), properties=props) for id_, geometry, props in zip(ids, topology['geometries'], records)]
+    return {
+        'type': 'Topology',
+        'transform': topology['transform'],
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': topology['arcs'],
+    }
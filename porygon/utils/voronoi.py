@@ -1,38 +1,98 @@
-from shapely.geometry import Polygon
-from scipy.spatial import Voronoi
+import numpy as np
+import shapely
+from shapely.geometry import Polygon, MultiPolygon, box
+from scipy.spatial import Voronoi, cKDTree
 
 
-def coords_to_voronoi_polygons(x, y):
+def coords_to_voronoi_polygons(x, y, clip=None, buffer=0.1):
     """
-    Get voronoi cells of a set of lat/longs
+    Get voronoi cells of a set of lat/longs, closed and clipped to a bounding box or clip geometry
     Parameters
     ----------
-    x : array of latitudes
-    y : array of longitudes
+    x : array of longitudes
+    y : array of latitudes
+    clip : shapely geometry (e.g. a city boundary) or (minx, miny, maxx, maxy) bounding box to clip the cells to.
+           Default is the bounding box of the points, padded by buffer
+    buffer : padding of the default bounding box, as a fraction of the extent of the points
 
     Returns
     -------
-    polygons  : list of shapely.Polygons
+    polygons  : np.ndarray of shapely.Polygons or MultiPolygons, in the same order as the input points.
+                Cells entirely outside of the clip geometry are empty Polygons
     """
+    points = np.column_stack([np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')])
+    n = len(points)
 
-    vor = Voronoi([i for i in zip(x, y)])
-    
-    polygons = []
-
-    for i in range(len(vor.regions)-1):
-        vertex_list = []
-        point_index = vor.point_region[i]  # the order of vor.regions is NOT the same as input lat/long
-        for x in vor.regions[point_index]:
-            if x == -1:
-                break
-            else:
-                vertex = vor.vertices[x]
-                # vertex = (vertex[1], vertex[0])  # flip the order for geojson???
-                vertex = (vertex[0], vertex[1])
-            vertex_list.append(vertex)
-        if len(vertex_list) >= 3:  # edge cells aren't enclosed
-            polygons.append(Polygon(vertex_list))
-        else:
-            polygons.append(Polygon([]))
+    if clip is None:
+        minx, miny = points.min(axis=0)
+        maxx, maxy = points.max(axis=0)
+        pad = max(maxx - minx, maxy - miny, 1e-6) * buffer
+        clip = box(minx - pad, miny - pad, maxx + pad, maxy + pad)
+    else:
+        clip = _clip_geometry(clip)
+
+    # Surround the points with far away sites, so that every cell of the input points is bounded
+    minx, miny, maxx, maxy = np.concatenate([np.minimum(points.min(axis=0), clip.bounds[:2]), np.maximum(points.max(axis=0), clip.bounds[2:])])
+    center = [(minx + maxx) / 2, (miny + maxy) / 2]
+    radius = max(maxx - minx, maxy - miny, 1e-6) * 10
+    far_sites = np.array(center) + radius * np.array([[-1, -1], [-1, 1], [1, 1], [1, -1]])
+    vor = Voronoi(np.concatenate([points, far_sites]))
+
+    # The order of vor.regions is NOT the same as the input points
+    regions = [vor.regions[r] for r in vor.point_region[:n]]
+    lengths = np.array([len(region) for region in regions])
+    vertices = np.fromiter((v for region in regions for v in region), dtype='int64', count=lengths.sum())
+    rings = shapely.linearrings(vor.vertices[vertices], indices=np.repeat(np.arange(n), lengths))
+    polygons = shapely.intersection(shapely.polygons(rings), clip)
+
+    # Clipping can leave empty or mixed geometry collections, keep only their polygonal parts
+    not_polygonal = ~np.isin(shapely.get_type_id(polygons), [3, 6])
+    for i in np.flatnonzero(not_polygonal):
+        parts = [p for p in getattr(polygons[i], 'geoms', []) if p.geom_type == 'Polygon']
+        polygons[i] = MultiPolygon(parts) if len(parts) > 1 else (parts[0] if parts else Polygon())
 
     return polygons
+
+
+def _clip_geometry(clip):
+    return box(*clip) if isinstance(clip, (tuple, list)) else clip
+
+
+def points_in_clip(x, y, clip):
+    """
+    Whether each point lies within the clip geometry (or on its boundary), so points outside clipped voronoi cells can be dropped
+    Parameters
+    ----------
+    x : array of longitudes
+    y : array of latitudes
+    clip : shapely geometry or (minx, miny, maxx, maxy) bounding box, as per coords_to_voronoi_polygons
+
+    Returns
+    -------
+    np.ndarray of bool
+    """
+    clip = _clip_geometry(clip)
+    shapely.prepare(clip)
+    return shapely.intersects_xy(clip, np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64'))
+
+
+def nearest_site(site_x, site_y, x, y, n_jobs=1):
+    """
+    Find the nearest site to each point, i.e. the voronoi cell of the sites containing the point
+    Parameters
+    ----------
+    site_x : array of site longitudes
+    site_y : array of site latitudes
+    x : array of point longitudes
+    y : array of point latitudes
+    n_jobs : number of threads used to query the KD-tree, -1 for all cpus
+
+    Returns
+    -------
+    positions : np.ndarray of the position of the nearest site to each point
+    """
+    tree = cKDTree(np.column_stack([np.asarray(site_x, dtype='float64'), np.asarray(site_y, dtype='float64')]))
+    if len(x) == 0:
+        return np.array([], dtype='int64')
+    _, positions = tree.query(np.column_stack([np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')]), workers=n_jobs)
+    return positions.astype('int64')
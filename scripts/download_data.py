@@ -1,66 +1,172 @@
 import os
-import pandas as pd
-import requests
-import zipfile
-import io
+import gzip
 import json
-from dotenv import find_dotenv, load_dotenv
+import shutil
+import time
+import zipfile
+import logging
+import requests
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from sodapy import Socrata
 
 from porygon.data import RAW_DATA_DIR, PROCESSED_DATA_DIR
 
-load_dotenv(find_dotenv())
+SOCRATA_URL = 'https://data.cityofchicago.org'
+PAGE_SIZE = 50_000
+MAX_WORKERS = 4
+RETRIES = 3
 
-socrata_app_token = os.getenv('socrata_app_token')
-socrata_client = Socrata("data.cityofchicago.org", app_token=socrata_app_token, timeout=1000)
 
+def _get(url, params=None, app_token=None, retries=RETRIES, **kwargs):
+    """GET with retries and exponential backoff, raising for HTTP errors"""
+    headers = dict(kwargs.pop('headers', {}))
+    if app_token:
+        headers['X-App-Token'] = app_token
+    kwargs.setdefault('timeout', 300)
+    for attempt in range(retries):
+        try:
+            r = requests.get(url, params=params, headers=headers, **kwargs)
+            r.raise_for_status()
+            return r
+        except requests.RequestException as e:
+            if attempt == retries - 1:
+                raise
+            logging.warning(f'Retrying {url} after {e}')
+            time.sleep(2 ** attempt)
+
+
+def _count_rows(dataset_id, base_url=SOCRATA_URL, app_token=None):
+    r = _get(f'{base_url}/resource/{dataset_id}.json', params={'$select': 'count(*)'}, app_token=app_token)
+    record = r.json()[0]
+    return int(next(iter(record.values())))
+
+
+def _download_page(dataset_id, page, part, fmt, page_size, base_url, app_token):
+    """Stream one page to its part file, which is only renamed into place once complete, so part files double as the checkpoint"""
+    params = {'$limit': page_size, '$offset': page * page_size, '$order': ':id'}
+    tmp = part.with_suffix('.tmp')
+    with _get(f'{base_url}/resource/{dataset_id}.{fmt}', params=params, app_token=app_token, stream=True) as r, open(tmp, 'wb') as f:
+        for block in r.iter_content(chunk_size=1 << 20):
+            f.write(block)
+    os.replace(tmp, part)
+    return part
 
-def download_chicago_traffic_accidents():
-    """Download traffic accident data from https://data.cityofchicago.org/Transportation/Traffic-Crashes-Crashes/85ca-t3if"""
 
-    # crashes 
-    results = socrata_client.get("85ca-t3if", limit = 500_000)  # as of 11/17/2019 there were 360K rows
-    df = pd.DataFrame.from_records(results)
-    df.to_csv(Path(RAW_DATA_DIR, 'chicago_traffic_crashes_crashes.csv.gz'), index=False, compression='gzip')
+def download_socrata_dataset(dataset_id, path, fmt='csv', page_size=PAGE_SIZE, max_workers=MAX_WORKERS, base_url=SOCRATA_URL, app_token=None):
+    """
+    Download a Socrata dataset page by page with a bounded pool of workers, streaming each page to disk as it arrives.
+    Completed pages are kept in a '{path}.parts' directory until every page is downloaded, so an interrupted run resumes
+    from the missing pages. Pages are then concatenated into path, without holding the dataset in memory
+    Parameters
+    ----------
+    dataset_id : Socrata dataset identifier, e.g. '85ca-t3if'
+    path : output file. A .gz suffix gzips the output
+    fmt : 'csv' to concatenate the pages into one csv, or 'json' for one json array of the records
+    page_size : number of rows per request
+    max_workers : number of pages downloaded concurrently
+    base_url : url of the Socrata domain, or of a stand-in server for tests
+    app_token : Socrata app token, to avoid throttling
+    """
+    assert fmt in ('csv', 'json'), f'fmt must be csv or json - got {fmt}'
+    path = Path(path)
+    parts_dir = path.with_name(path.name + '.parts')
+    parts_dir.mkdir(parents=True, exist_ok=True)
 
-    # vehicles
-    results = socrata_client.get("68nd-jvt3", limit = 1_000_000) 
-    df = pd.DataFrame.from_records(results)
-    df.to_csv(Path(RAW_DATA_DIR, 'chicago_traffic_crashes_vehicles.csv.gz'), index=False, compression='gzip')
+    n_pages = max(-(-_count_rows(dataset_id, base_url, app_token) // page_size), 1)
+    parts = [Path(parts_dir, f'{page:06d}.{fmt}') for page in range(n_pages)]
+    missing = [page for page, part in enumerate(parts) if not part.exists()]
+    logging.info(f'{dataset_id}: downloading {len(missing)} of {n_pages} pages')
 
-    # people
-    results = socrata_client.get("u6pd-qa9d", limit = 1_000_000) 
-    df = pd.DataFrame.from_records(results)
-    df.to_csv(Path(RAW_DATA_DIR, 'chicago_traffic_crashes_people.csv.gz'), index=False, compression='gzip')
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_download_page, dataset_id, page, parts[page], fmt, page_size, base_url, app_token) for page in missing]
+        for future in futures:
+            future.result()
 
+    _concatenate_parts(parts, path, fmt)
+    shutil.rmtree(parts_dir)
+    return path
 
-def download_chicago_census_tract_boundaries():
+
+def _concatenate_parts(parts, path, fmt):
+    """Concatenate the part files into path, keeping the csv header of the first part only"""
+    tmp = path.with_name(path.name + '.tmp')
+    with (gzip.open(tmp, 'wb') if path.suffix == '.gz' else open(tmp, 'wb')) as out:
+        if fmt == 'json':
+            out.write(b'[')
+        first = True
+        for part in parts:
+            with open(part, 'rb') as f:
+                if fmt == 'csv':
+                    header = f.readline()
+                    if first:
+                        out.write(header)
+                    shutil.copyfileobj(f, out)
+                    first = False
+                else:
+                    records = f.read().strip()[1:-1].strip()  # each page is a json array
+                    if records:
+                        out.write(records if first else b',' + records)
+                        first = False
+        if fmt == 'json':
+            out.write(b']')
+    os.replace(tmp, path)
+
+
+def download_file(url, path, chunk_size=1 << 20):
+    """Stream a file to disk, resuming a partial download with a range request if the server supports it"""
+    path = Path(path)
+    partial = path.with_name(path.name + '.part')
+    offset = partial.stat().st_size if partial.exists() else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+    with _get(url, stream=True, headers=headers) as r:
+        mode = 'ab' if offset and r.status_code == 206 else 'wb'
+        with open(partial, mode) as f:
+            for block in r.iter_content(chunk_size=chunk_size):
+                f.write(block)
+    os.replace(partial, path)
+    return path
+
+
+def download_chicago_traffic_accidents(app_token=None, **kwargs):
+    """Download traffic accident data from https://data.cityofchicago.org/Transportation/Traffic-Crashes-Crashes/85ca-t3if"""
+    download_socrata_dataset('85ca-t3if', Path(RAW_DATA_DIR, 'chicago_traffic_crashes_crashes.csv.gz'), app_token=app_token, **kwargs)
+    download_socrata_dataset('68nd-jvt3', Path(RAW_DATA_DIR, 'chicago_traffic_crashes_vehicles.csv.gz'), app_token=app_token, **kwargs)
+    download_socrata_dataset('u6pd-qa9d', Path(RAW_DATA_DIR, 'chicago_traffic_crashes_people.csv.gz'), app_token=app_token, **kwargs)
+
+
+def download_chicago_census_tract_boundaries(app_token=None, **kwargs):
     """Download census tract shapefiles from https://data.cityofchicago.org/Facilities-Geographic-Boundaries/Boundaries-Census-Tracts-2010/5jrd-6zik"""
-    results = socrata_client.get("74p9-q2aq", limit = 1_000_000) 
-    with open(Path(RAW_DATA_DIR, 'chicago_census_tract_boundaries.json'), 'w') as f:
-        json.dump(results, f)
+    path = download_socrata_dataset('74p9-q2aq', Path(RAW_DATA_DIR, 'chicago_census_tract_boundaries.json'), fmt='json', app_token=app_token, **kwargs)
     # Since there are no changes, just directly save in processed data
-    with open(Path(PROCESSED_DATA_DIR, 'chicago_census_tract_boundaries.json'), 'w') as f:
-        json.dump(results, f)
+    shutil.copyfile(path, Path(PROCESSED_DATA_DIR, 'chicago_census_tract_boundaries.json'))
 
 
-def download_chicago_cta_L_stops():
+def download_chicago_cta_L_stops(app_token=None, **kwargs):
     """Download Chicago CTA L stops from https://data.cityofchicago.org/Transportation/CTA-System-Information-List-of-L-Stops/8pix-ypme"""
-    results = socrata_client.get("8pix-ypme", limit = 1_000_000) 
-    df = pd.DataFrame.from_records(results)
+    # json rather than csv records, so the location column keeps its latitude and longitude fields. The dataset is a few hundred rows
+    path = download_socrata_dataset('8pix-ypme', Path(RAW_DATA_DIR, 'chicago_L_stops.json'), fmt='json', app_token=app_token, **kwargs)
+    with open(path) as f:
+        df = pd.DataFrame.from_records(json.load(f))
     df.to_csv(Path(RAW_DATA_DIR, 'chicago_L_stops.csv.gz'), index=False, compression='gzip')
-    
 
-def download_annual_conc_by_monitor_2019():
+
+def download_annual_conc_by_monitor_2019(url='https://aqs.epa.gov/aqsweb/airdata/annual_conc_by_monitor_2019.zip'):
     """Download USA air quality data from https://aqs.epa.gov/aqsweb/airdata/download_files.html"""
-    r = requests.get('https://aqs.epa.gov/aqsweb/airdata/annual_conc_by_monitor_2019.zip')
-    z = zipfile.ZipFile(io.BytesIO(r.content))
-    z.extractall(RAW_DATA_DIR)
+    path = download_file(url, Path(RAW_DATA_DIR, 'annual_conc_by_monitor_2019.zip'))
+    with zipfile.ZipFile(path) as z:
+        z.extractall(RAW_DATA_DIR)
 
 
 if __name__ == "__main__":
-    download_chicago_traffic_accidents()
-    download_chicago_census_tract_boundaries()
-    download_chicago_cta_L_stops()
+    from dotenv import find_dotenv, load_dotenv
+    load_dotenv(find_dotenv())
+    logging.basicConfig(level=logging.INFO)
+    RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+    socrata_app_token = os.getenv('socrata_app_token')
+    download_chicago_traffic_accidents(socrata_app_token)
+    download_chicago_census_tract_boundaries(socrata_app_token)
+    download_chicago_cta_L_stops(socrata_app_token)
     download_annual_conc_by_monitor_2019()
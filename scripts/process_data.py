@@ -1,53 +1,113 @@
 import pandas as pd
-import json
 from pathlib import Path
-import ast 
-import os
 
 from porygon.data import RAW_DATA_DIR, PROCESSED_DATA_DIR
 # RAW_DATA_DIR = Path(Path(os.path.dirname(__file__)).parent, 'data/raw')
 # PROCESSED_DATA_DIR = Path(Path(os.path.dirname(__file__)).parent, 'porygon/data/datasets')
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
 
-def process_chicago_traffic_accidents():
-    crashes = pd.read_csv(Path(RAW_DATA_DIR, 'chicago_traffic_crashes_crashes.csv.gz'), compression='gzip')
-    vehicles = pd.read_csv(Path(RAW_DATA_DIR, 'chicago_traffic_crashes_vehicles.csv.gz'), compression='gzip')
-    df = pd.merge(crashes, vehicles)  # TODO - specify columns to merge on, and deal with overlap
-    df['date_time'] = pd.to_datetime(df.crash_date)
-    df = df.loc[df['date_time'].dt.year == 2019]
-    df['crash_date'] = df['date_time'].dt.strftime('%Y-%m-%d')
+CHUNKSIZE = 200_000
+
+# Regexes of the coordinates of a Socrata location field, as a python dict repr or json
+_LOCATION_PATTERNS = {
+    'latitude': r"""['"]latitude['"]\s*:\s*['"]?(-?[\d.]+)""",
+    'longitude': r"""['"]longitude['"]\s*:\s*['"]?(-?[\d.]+)""",
+}
+
+
+def process_chicago_traffic_accidents(chunksize=CHUNKSIZE):
+    """
+    Join 2019 crashes to the vehicles involved, reading both tables in chunks of only the needed columns.
+    Only the 2019 crashes are held in memory, as the join keys of the vehicles chunks
+    """
+    crash_chunks = pd.read_csv(Path(RAW_DATA_DIR, 'chicago_traffic_crashes_crashes.csv.gz'), compression='gzip', chunksize=chunksize,
+                               usecols=['crash_record_id', 'rd_no', 'crash_date', 'latitude', 'longitude'],
+                               dtype={'crash_record_id': str, 'rd_no': str, 'crash_date': str, 'latitude': float, 'longitude': float})
+    crashes = pd.concat([_filter_year(chunk, 2019) for chunk in crash_chunks]).set_index('crash_record_id')
+
+    vehicle_chunks = pd.read_csv(Path(RAW_DATA_DIR, 'chicago_traffic_crashes_vehicles.csv.gz'), compression='gzip', chunksize=chunksize,
+                                 usecols=['crash_record_id', 'unit_type', 'make'], dtype=str)
     cols = ['rd_no', 'crash_date', 'latitude', 'longitude', 'unit_type', 'make']
-    df = df[cols]
-    df.to_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), index=False, compression='gzip')
+    chunks = (chunk.join(crashes, on='crash_record_id', how='inner')[cols] for chunk in vehicle_chunks)
+    _write_chunks(chunks, 'chicago_traffic_accidents')
+
+
+def _filter_year(df, year):
+    """Rows of crashes in the given year, with crash_date formatted as %Y-%m-%d"""
+    dates = pd.to_datetime(df['crash_date'])
+    df = df.loc[dates.dt.year == year].copy()
+    df['crash_date'] = dates[df.index].dt.strftime('%Y-%m-%d')
+    return df
 
 
 def process_chicago_L_stops():
     df = pd.read_csv(Path(RAW_DATA_DIR, 'chicago_L_stops.csv.gz'), compression='gzip')
     df = df.drop_duplicates('map_id')  # don't need separate N/S and E/W stops
-    df['latitude'] = df.location.apply(lambda x: float(ast.literal_eval(x)['latitude'])) 
-    df['longitude'] = df.location.apply(lambda x: float(ast.literal_eval(x)['longitude'])) 
+    for col, pattern in _LOCATION_PATTERNS.items():
+        df[col] = df['location'].str.extract(pattern, expand=False).astype(float)
     cols = ['station_name', 'latitude', 'longitude', 'station_descriptive_name',  'red', 'blue', 'g', 'brn', 'p', 'pexp', 'y', 'pnk', 'o']
-    df = df[cols]
-    df.to_csv(Path(PROCESSED_DATA_DIR, 'chicago_L_stops.csv.gz'), index=False, compression='gzip')
+    _write_chunks([df[cols]], 'chicago_L_stops')
 
 
-def process_air_quality_data():
-    df = pd.read_csv(Path(RAW_DATA_DIR, 'annual_conc_by_monitor_2019.csv'))
-    rename_dict = {'Latitude': 'latitude', 
-               'Longitude': 'longitude', 
+def process_air_quality_data(chunksize=CHUNKSIZE):
+    rename_dict = {'Latitude': 'latitude',
+               'Longitude': 'longitude',
                'Year': 'year',
-               'Local Site Name': 'site_name', 
+               'Local Site Name': 'site_name',
                'Parameter Name': 'parameter',
                'Arithmetic Mean': 'val_mean'}
+    usecols = ['State Code', 'County Code', 'Site Num', 'Sample Duration', *rename_dict]
+
+    chunks = []
+    for df in pd.read_csv(Path(RAW_DATA_DIR, 'annual_conc_by_monitor_2019.csv'), usecols=usecols, chunksize=chunksize,
+                          dtype={'State Code': str, 'County Code': str, 'Site Num': str}):
+        df = df.loc[df['Sample Duration'] == "24 HOUR"].rename(columns=rename_dict)
+        # codes are read as strings, so non-numeric state codes (e.g. 'CC' for Canada) are kept, then stripped of the zero padding
+        # numeric codes lose when read as numbers. site_code stays a string
+        df['site_code'] = _strip_zero_padding(df['State Code']) + _strip_zero_padding(df['County Code']) + _strip_zero_padding(df['Site Num'])
+        chunks.append(df[['site_code', 'latitude', 'longitude', 'year', 'parameter', 'val_mean']])
+
+    df = pd.concat(chunks).drop_duplicates(subset=['site_code', 'parameter'])
+    _write_chunks([df], 'air_quality_data')
+
+
+def _strip_zero_padding(codes: pd.Series):
+    """Codes as they read as numbers, e.g. '001' as '1', keeping non-numeric codes as is"""
+    stripped = codes.str.lstrip('0')
+    return stripped.mask(stripped.eq('') & codes.str.len().gt(0), '0')
 
-    df = df.rename(columns=rename_dict)
-    df = df.loc[df['Sample Duration'] == "24 HOUR"]
-    df['site_code'] = df['State Code'].astype('str') + df['County Code'].astype('str') + df['Site Num'].astype('str')
-    df.drop_duplicates(subset=['site_code', 'parameter'], inplace=True)
 
-    cols = ['site_code', 'latitude', 'longitude', 'year', 'parameter', 'val_mean']
-    df = df[cols]
-    df.to_csv(Path(PROCESSED_DATA_DIR, 'air_quality_data.csv.gz'), index=False, compression='gzip')
+def _write_chunks(chunks, name):
+    """
+    Stream dataframe chunks to {name}.csv.gz in PROCESSED_DATA_DIR, and with pyarrow also to the columnar {name}.parquet
+    that porygon.data loaders read instead of the csv, see porygon.data.load_data._read_cached
+    """
+    csv_path = Path(PROCESSED_DATA_DIR, f'{name}.csv.gz')
+    parquet_path = Path(PROCESSED_DATA_DIR, f'{name}.parquet')
+    writer = None
+    header = True
+    try:
+        with open(csv_path, 'wb') as f:
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=header, compression='gzip', mode='ab')
+                header = False
+                if _HAS_PYARROW:
+                    # without pandas metadata, so the parquet reads back with the same dtypes as the csv
+                    table = pa.Table.from_pandas(chunk, preserve_index=False).replace_schema_metadata(None)
+                    if writer is None:
+                        # columns that are all missing in the first chunk are typed from later chunks as strings
+                        schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema])
+                        writer = pq.ParquetWriter(parquet_path, schema)
+                    writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from porygon import PorygonDataFrame, SpaceTimeCube
+from porygon.utils.data import df_to_gpdf
+from porygon.data import load_chicago_L_stops
+from porygon.data import PROCESSED_DATA_DIR
+
+
+def test_spacetimecube():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    df = df[['latitude', 'longitude', 'crash_date', 'count']]
+    df['crash_date'] = pd.to_datetime(df['crash_date']) - pd.to_timedelta(np.arange(len(df)) % 3 * 31, unit='D')  # spread over 3 months
+
+    cube = SpaceTimeCube.from_h3(df, 'crash_date', freq='M', h3_level=8)
+    assert len(cube.times) == 3
+    assert cube.data['count'].sum() == df.dropna()['count'].sum()
+
+    # each slice matches aggregating just the points of its time bucket
+    for time, pdf in cube.slices():
+        points = df[df['crash_date'].dt.to_period('M').dt.start_time == time].drop(columns='crash_date')
+        expected = PorygonDataFrame().from_h3(points, h3_level=8)
+        pd.testing.assert_frame_equal(pd.DataFrame(pdf).sort_index(), pd.DataFrame(expected).sort_index())
+
+    gpdf = df_to_gpdf(load_chicago_L_stops())
+    gpdf.index.name = 'id'
+    cube = SpaceTimeCube.from_voronoi(df, gpdf, 'crash_date', freq='M')
+    assert cube.data['count'].sum() == df.dropna()['count'].sum()
+    m = cube.to_time_slider('count')
+
+    # points outside the clip aren't counted, as per PorygonDataFrame.from_voronoi
+    clip = (-87.7, 41.8, -87.6, 41.9)
+    cube = SpaceTimeCube.from_voronoi(df, gpdf, 'crash_date', freq='M', clip=clip)
+    expected = PorygonDataFrame().from_voronoi(df.drop(columns='crash_date'), gpdf, clip=clip)
+    assert cube.data['count'].sum() == expected['count'].sum()
+    totals = cube.data.groupby(level='id')['count'].sum()
+    pd.testing.assert_series_equal(totals.sort_index(), expected['count'].sort_index(), check_names=False)
@@ -0,0 +1,58 @@
+import shutil
+import pandas as pd
+import pytest
+from pathlib import Path
+from geopandas import GeoDataFrame
+
+import porygon.data.load_data as load_data
+from porygon.data import PROCESSED_DATA_DIR
+
+
+@pytest.fixture
+def datasets_dir(tmp_path, monkeypatch):
+    shutil.copy(Path(PROCESSED_DATA_DIR, 'chicago_L_stops.csv.gz'), tmp_path)
+    monkeypatch.setattr(load_data, 'PROCESSED_DATA_DIR', tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize('has_pyarrow', [True, False])
+def test_load_point_dataset(datasets_dir, monkeypatch, has_pyarrow):
+    if has_pyarrow:
+        pytest.importorskip('pyarrow')
+    monkeypatch.setattr(load_data, '_HAS_PYARROW', has_pyarrow)
+    expected = pd.read_csv(Path(datasets_dir, 'chicago_L_stops.csv.gz'), compression='gzip')
+
+    # the first call builds the cache, later calls read it
+    pd.testing.assert_frame_equal(load_data.load_chicago_L_stops(), expected)
+    assert Path(datasets_dir, 'chicago_L_stops.parquet').exists() == has_pyarrow
+    pd.testing.assert_frame_equal(load_data.load_chicago_L_stops(), expected)
+
+    df = load_data.load_chicago_L_stops(columns=['station_name'], filters=[('red', '==', True)])
+    assert df['station_name'].tolist() == expected.loc[expected['red'], 'station_name'].tolist()
+
+    # filters in separate lists are OR'ed
+    df = load_data.load_chicago_L_stops(columns=['station_name'], filters=[[('red', '==', True)], [('blue', '==', True)]])
+    assert len(df) == (expected['red'] | expected['blue']).sum()
+
+    gpdf = load_data.load_chicago_L_stops(columns=['station_name'], as_gpdf=True)
+    assert isinstance(gpdf, GeoDataFrame) and gpdf.columns.tolist() == ['station_name', 'geometry']
+    assert gpdf.geometry.y.tolist() == expected['latitude'].tolist()
+
+
+def test_interrupted_cache_write(datasets_dir, monkeypatch):
+    pytest.importorskip('pyarrow')
+
+    def interrupted(df, path, **kwargs):
+        Path(path).write_bytes(b'PAR1')  # truncated
+        raise OSError('No space left on device')
+
+    # a failed write leaves no cache behind, so the next call builds it rather than reading a truncated file
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', interrupted)
+    expected = pd.read_csv(Path(datasets_dir, 'chicago_L_stops.csv.gz'), compression='gzip')
+    pd.testing.assert_frame_equal(load_data.load_chicago_L_stops(), expected)
+    assert [p.name for p in datasets_dir.iterdir()] == ['chicago_L_stops.csv.gz']
+
+    monkeypatch.undo()
+    monkeypatch.setattr(load_data, 'PROCESSED_DATA_DIR', datasets_dir)
+    pd.testing.assert_frame_equal(load_data.load_chicago_L_stops(), expected)
+    assert Path(datasets_dir, 'chicago_L_stops.parquet').exists()
@@ -0,0 +1,94 @@
+import json
+import io
+import threading
+import importlib.util
+import zipfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import pytest
+
+spec = importlib.util.spec_from_file_location('download_data', Path(Path(__file__).parent.parent, 'scripts', 'download_data.py'))
+download_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(download_data)
+
+ROWS = pd.DataFrame({'id': range(23), 'value': [f'v{i}' for i in range(23)]})
+ZIP = io.BytesIO()
+with zipfile.ZipFile(ZIP, 'w') as z:
+    z.writestr('annual.csv', 'a,b\n1,2\n')
+
+
+class SocrataStandIn(BaseHTTPRequestHandler):
+    """Serves ROWS as a Socrata resource, with $select=count(*), $limit and $offset, and the zip with range requests"""
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.requests.append((url.path, query))
+        if url.path == '/annual.zip':
+            body = ZIP.getvalue()
+            start = int(self.headers['Range'][len('bytes='):-1]) if 'Range' in self.headers else 0
+            return self._respond(body[start:], status=206 if start else 200)
+        if '$select' in query:
+            return self._respond(json.dumps([{'count': str(len(ROWS))}]).encode())
+
+        page = ROWS.iloc[int(query['$offset']):int(query['$offset']) + int(query['$limit'])]
+        if url.path.endswith('.csv'):
+            return self._respond(page.to_csv(index=False).encode())
+        return self._respond(page.to_json(orient='records').encode())
+
+    def _respond(self, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SocrataStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    SocrataStandIn.requests = []
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def test_download_socrata_dataset(base_url, tmp_path):
+    path = Path(tmp_path, 'rows.csv.gz')
+    download_data.download_socrata_dataset('abcd-1234', path, page_size=5, max_workers=2, base_url=base_url)
+    pd.testing.assert_frame_equal(pd.read_csv(path, compression='gzip'), ROWS)
+    assert not path.with_name('rows.csv.gz.parts').exists()
+
+    path = Path(tmp_path, 'rows.json')
+    download_data.download_socrata_dataset('abcd-1234', path, fmt='json', page_size=5, base_url=base_url)
+    with open(path) as f:
+        assert json.load(f) == ROWS.to_dict(orient='records')
+
+    # an interrupted run resumes from the pages that weren't downloaded
+    path = Path(tmp_path, 'resumed.csv')
+    parts_dir = Path(tmp_path, 'resumed.csv.parts')
+    parts_dir.mkdir()
+    ROWS.iloc[:5].to_csv(Path(parts_dir, '000000.csv'), index=False)
+    SocrataStandIn.requests = []
+    download_data.download_socrata_dataset('abcd-1234', path, page_size=5, base_url=base_url)
+    offsets = sorted(int(q['$offset']) for _, q in SocrataStandIn.requests if '$offset' in q)
+    assert offsets == [5, 10, 15, 20]
+    pd.testing.assert_frame_equal(pd.read_csv(path), ROWS)
+
+
+def test_download_file(base_url, tmp_path):
+    path = Path(tmp_path, 'annual.zip')
+    download_data.download_file(f'{base_url}/annual.zip', path)
+    assert path.read_bytes() == ZIP.getvalue()
+
+    # a partial download is resumed with a range request
+    Path(tmp_path, 'annual.zip.part').write_bytes(ZIP.getvalue()[:10])
+    download_data.download_file(f'{base_url}/annual.zip', path)
+    assert path.read_bytes() == ZIP.getvalue()
+    assert zipfile.ZipFile(path).read('annual.csv') == b'a,b\n1,2\n'
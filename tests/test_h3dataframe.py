@@ -0,0 +1,77 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from h3.api import numpy_int as h3
+
+from porygon import PorygonDataFrame, H3DataFrame
+from porygon.data import PROCESSED_DATA_DIR
+
+
+def test_h3dataframe():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    h3df = H3DataFrame.from_points(df[['latitude', 'longitude', 'count']], h3_level=9)
+    assert h3df.index.dtype == np.uint64 and h3df.h3_level == 9
+
+    # hexagons are only built when needed
+    assert '_index_cache' not in h3df.__dict__
+    expected = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']], h3_level=9)
+    pd.testing.assert_frame_equal(pd.DataFrame(h3df.to_porygon()), pd.DataFrame(expected))
+    assert all(a.equals(b) for a, b in zip(h3df.geometry, expected.geometry))
+
+    # pandas operations keep the integer cells
+    subset = h3df[h3df['count'] > 1]
+    assert isinstance(subset, H3DataFrame) and subset.index.dtype == np.uint64
+
+    parent = h3df.to_parent(7)
+    assert parent.h3_level == 7 and parent['count'].sum() == h3df['count'].sum()
+
+    m = h3df.to_choropleth('count')
+
+
+def test_k_ring_smooth():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=2000, compression='gzip')
+    df['count'] = 1
+    h3df = H3DataFrame.from_points(df[['latitude', 'longitude', 'count']], h3_level=9)
+    h3df['half'] = h3df['count'].where(h3df['count'] > 1)
+
+    # the weighted mean of each cell's k-ring computed one cell at a time
+    cells = set(h3df.index.values.tolist())
+    expected_sum, expected_mean = [], []
+    for cell in h3df.index.values.tolist():
+        total, norm = 0, 0
+        for d, ring in enumerate(h3.k_ring_distances(cell, 2)):
+            for neighbour in ring:
+                if neighbour in cells:
+                    w = 1 - d / 3
+                    total += w * h3df.loc[neighbour, 'count']
+                    norm += w
+        expected_sum.append(total)
+        expected_mean.append(total / norm)
+
+    smoothed = h3df.k_ring_smooth(k=2)
+    assert isinstance(smoothed, H3DataFrame) and smoothed.index.equals(h3df.index)
+    np.testing.assert_allclose(smoothed['count'], expected_mean)
+    np.testing.assert_allclose(h3df.k_ring_smooth('count', k=2, how='sum')['count'], expected_sum)
+    # missing values don't contribute to their neighbours' means
+    assert smoothed['half'].notna().sum() >= h3df['half'].notna().sum()
+    assert (smoothed['half'].dropna() > 1).all()
+
+    # the adjacency is cached per k, and shared with uniform or custom weights
+    assert ('k_ring', 2) in h3df._index_cache[1]
+    uniform = h3df.k_ring_smooth('count', k=2, weights='uniform', how='sum')
+    pd.testing.assert_series_equal(uniform['count'], h3df.k_ring_smooth('count', k=2, weights=[1, 1, 1], how='sum')['count'])
+    assert (uniform['count'] >= smoothed['count']).all()
+
+    porygon = h3df.to_porygon().k_ring_smooth('count', k=2)
+    np.testing.assert_allclose(porygon['count'], expected_mean)
+
+    # reads keep the derived state of the geometry, so a warm to_geojson and k_ring_smooth stay warm
+    porygon = h3df.to_porygon()
+    porygon.to_geojson()
+    cache = porygon._geometry_cache[-1]
+    porygon.k_ring_smooth('count', k=2)
+    porygon.to_choropleth('count')
+    porygon.k_ring_smooth('count', k=2)
+    assert porygon._geometry_cache[-1] is cache
+    assert ('geojson', 6) in cache and ('k_ring', 2) in cache
@@ -0,0 +1,11 @@
+import subprocess
+import sys
+
+# Plotting and rendering dependencies are only imported on first use, so aggregation-only workers don't pay for them
+LAZY_MODULES = ['folium', 'branca', 'seaborn', 'matplotlib', 'geojson', 'selenium']
+
+
+def test_import_is_lazy():
+    code = 'import sys, porygon, porygon.utils, porygon.data; print(",".join(sorted(m for m in sys.modules if m.split(".")[0] in %r)))' % LAZY_MODULES
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '', f'import porygon loaded {result.stdout.strip()}'
@@ -0,0 +1,69 @@
+import json
+import threading
+import pandas as pd
+from pathlib import Path
+
+from porygon import PorygonDataFrame, profile
+from porygon import instrumentation
+from porygon.instrumentation import add_callback, remove_callback, stage, _NULL_STAGE
+from porygon.data import PROCESSED_DATA_DIR
+
+
+def test_profile():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+
+    # disabled instrumentation records nothing, and stages are a shared no-op
+    assert stage('assign', rows_in=len(df)) is _NULL_STAGE
+
+    records = []
+    add_callback(records.append)
+    try:
+        with profile(trace_memory=True) as p:
+            pdf = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']])
+            pdf.to_choropleth('count')
+    finally:
+        remove_callback(records.append)
+    assert records == p.records
+
+    stages = {r['stage']: r for r in p.records}
+    for name in ['from_h3/validate', 'from_h3/assign', 'from_h3/aggregate', 'from_h3/build', 'from_h3', 'to_choropleth/serialize']:
+        assert name in stages
+    assert stages['from_h3/validate']['rows_in'] == 1000
+    assert stages['from_h3/aggregate']['rows_out'] == len(pdf)
+    assert all(r['seconds'] >= 0 and 'memory_peak' in r for r in p.records)
+    assert stages['from_h3']['seconds'] >= stages['from_h3/aggregate']['seconds']
+
+    exported = json.loads(p.to_json())
+    assert exported['stages'] == p.records
+    assert exported['total_seconds'] == stages['from_h3']['seconds'] + stages['to_choropleth']['seconds']
+
+
+def test_profile_threads_and_memory_fallback(monkeypatch):
+    # stages running concurrently in other threads aren't nested in each other
+    entered, release = threading.Barrier(2), threading.Event()
+
+    def run(name):
+        with stage(name):
+            entered.wait()
+            release.wait()
+
+    with profile() as p:
+        threads = [threading.Thread(target=run, args=(name, )) for name in ['a', 'b']]
+        for t in threads:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join()
+    assert sorted(r['stage'] for r in p.records) == ['a', 'b']
+
+    # without tracemalloc.reset_peak (before Python 3.9), the peak of a stage is still at least what it allocated
+    monkeypatch.setattr(instrumentation, '_reset_peak', None)
+    with profile(trace_memory=True) as p:
+        with stage('outer'):
+            with stage('inner'):
+                data = bytearray(10 ** 7)
+            del data
+    stages = {r['stage']: r for r in p.records}
+    assert stages['outer/inner']['memory_peak'] >= 10 ** 7 and stages['outer']['memory_peak'] >= 10 ** 7
+    assert stages['outer']['memory_delta'] < 10 ** 7
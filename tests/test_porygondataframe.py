@@ -4,9 +4,13 @@ from pathlib import Path
 from shapely.geometry import shape, Point, Polygon, MultiPolygon, MultiPoint
 from geopandas import GeoDataFrame
 import pytest
+import logging
+import re
+from h3 import h3
 
 from porygon import PorygonDataFrame
 from porygon.utils.data import df_to_gpdf, _validate_point_data
+from porygon.utils.sketches import HyperLogLog
 from porygon.data import load_chicago_census_tract_boundaries, load_chicago_L_stops
 
 from porygon.data import PROCESSED_DATA_DIR
@@ -51,6 +55,18 @@ def test_porygondataframe_from_voronoi():
     m = pdf.to_choropleth('count')
     m = pdf.to_categorical_map('count', 'category')
 
+    # points outside the clip aren't counted in the clipped cells
+    clip = (-87.7, 41.8, -87.6, 41.9)
+    points = df.dropna(subset=['latitude', 'longitude'])
+    inside = points['longitude'].between(clip[0], clip[2]) & points['latitude'].between(clip[1], clip[3])
+    assert 0 < inside.sum() < len(points)
+    clipped = PorygonDataFrame().from_voronoi(df[['latitude', 'longitude', 'count']], gpdf, clip=clip)
+    assert clipped['count'].sum() == inside.sum()
+    assert not clipped.geometry.is_empty.any()
+    chunked = PorygonDataFrame().from_voronoi_chunks([df[['latitude', 'longitude', 'count']][:500], df[['latitude', 'longitude', 'count']][500:]],
+                                                     gpdf, aggfunc='sum', clip=clip)
+    pd.testing.assert_series_equal(chunked['count'], clipped['count'])
+
 
 def test_porygon_index():
     census_tracts = load_chicago_census_tract_boundaries()
@@ -82,9 +98,335 @@ def test_porygon_geometry():
     gpdf = GeoDataFrame({'geometry': [Polygon(box1), MultiPolygon([Polygon(box1), Polygon(box2)])]})
     pgdf = PorygonDataFrame(gpdf)
 
+
+def test_porygondataframe_derived_frames():
+    box1 = [(0,0), (0,1), (1,1), (1,0)]
+    box2 = [(2,2), (2,3), (3,3), (3,2)]
+    pgdf = PorygonDataFrame(GeoDataFrame({'id': ['a', 'b'], 'val': [1, 2], 'geometry': [Polygon(box1), Polygon(box2)]}).set_index('id'))
+    assert pgdf.centroid_point == [1.5, 1.5]
+
+    # pandas operations that keep the geometry remain PorygonDataFrames, with their own derived state
+    subset = pgdf[pgdf['val'] > 1]
+    assert isinstance(subset, PorygonDataFrame) and isinstance(pgdf.copy(), PorygonDataFrame)
+    assert subset.centroid_point == [2.5, 2.5]
+    assert not isinstance(pgdf[['val']], PorygonDataFrame)
+
+    # operations that break the index invariants fall back to GeoDataFrames
+    for df in [pd.concat([pgdf, pgdf]), pgdf.reset_index(), pgdf.set_index('val'), pgdf.rename(index={'b': 'a'})]:
+        assert type(df) is GeoDataFrame
+    assert isinstance(pd.concat([pgdf, pgdf.rename(index={'a': 'c', 'b': 'd'})]), PorygonDataFrame)
+
+    # the same operations in place fall back the same way, without converting the index
+    for operation in [lambda df: df.reset_index(inplace=True), lambda df: df.set_index('val', inplace=True),
+                      lambda df: df.set_axis(['x', 'x'], inplace=True), lambda df: df.rename(index={'b': 'a'}, inplace=True)]:
+        df = pgdf.copy()
+        expected = pgdf.copy()
+        expected.__class__ = GeoDataFrame
+        expected = operation(expected) or expected
+        operation(df)
+        assert type(df) is GeoDataFrame
+        pd.testing.assert_index_equal(df.index, expected.index)
+    df = pgdf.copy()
+    df.rename(index={'b': 'c'}, inplace=True)
+    assert isinstance(df, PorygonDataFrame) and df.index.tolist() == ['a', 'c']
+
+    # the map defaults can be overridden
+    maps = pgdf.copy()
+    maps.zoom_start, maps.centroid_point = 12, [41.9, -87.6]
+    assert maps.zoom_start == 12 and maps.centroid_point == [41.9, -87.6]
+    assert maps.to_choropleth('val').location == [41.9, -87.6]
+
+    # replaced geometry is validated again before it is serialized
+    subset['geometry'] = [Point(0, 0)]
+    assert subset.centroid_point == [0, 0]
+    with pytest.raises(AssertionError):
+        subset.to_geojson()
+
+    # geometry edited in place, which keeps the same geometry array, is derived and validated again too
+    pgdf.to_geojson()
+    pgdf.loc['a', 'geometry'] = Polygon([(10, 10), (10, 11), (11, 11), (11, 10)])
+    assert pgdf.centroid_point == [6.5, 6.5]
+    assert '[10.0,10.0]' in pgdf.to_geojson()
+    pgdf.geometry.iloc[1] = Polygon(box1)
+    assert pgdf.centroid_point == [5.5, 5.5]
+    pgdf.at['b', 'geometry'] = Polygon(box2)
+    assert pgdf.centroid_point == [6.5, 6.5]
+    pgdf.iloc[0, pgdf.columns.get_loc('geometry')] = Point(0, 0)
+    with pytest.raises(AssertionError):
+        pgdf.to_geojson()
+
+
 def test_point_geometry():
     p1 = (0,0)
     p2 = (1,1)
     gpdf = GeoDataFrame({'geometry': [MultiPoint([p1,p2])]})
     with pytest.raises(AssertionError):
         _validate_point_data(GeoDataFrame({'geometry': [MultiPoint([p1,p2])]}))
+
+
+def test_porygondataframe_from_chunks():
+    path = Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz')
+    cols = ['latitude', 'longitude', 'count']
+    df = pd.read_csv(path, nrows=1000, compression='gzip')
+    df['count'] = 1
+    chunks = lambda: (chunk.assign(count=1)[cols] for chunk in pd.read_csv(path, nrows=1000, chunksize=300, compression='gzip'))
+
+    for aggfunc in ['sum', 'count', 'mean', np.min, np.max]:
+        h3df = PorygonDataFrame().from_h3(df[cols], h3_level=8, aggfunc=aggfunc)
+        h3df_chunks = PorygonDataFrame().from_h3_chunks(chunks(), h3_level=8, aggfunc=aggfunc)
+        pd.testing.assert_frame_equal(pd.DataFrame(h3df), pd.DataFrame(h3df_chunks))
+
+    gpdf = df_to_gpdf(load_chicago_L_stops())
+    gpdf.index.name = 'id'
+    pdf = PorygonDataFrame().from_voronoi(df[cols], gpdf, aggfunc='sum')
+    pdf_chunks = PorygonDataFrame().from_voronoi_chunks(chunks(), gpdf, aggfunc='sum')
+    pd.testing.assert_frame_equal(pd.DataFrame(pdf), pd.DataFrame(pdf_chunks))
+
+    with pytest.raises(AssertionError):
+        PorygonDataFrame().from_h3_chunks(chunks(), aggfunc=np.median)
+
+    # sketches are merged across chunks into the same state as a single pass
+    aggfunc = {'count': 'sum', 'rd_no': HyperLogLog()}
+    h3df = PorygonDataFrame().from_h3(df[cols + ['rd_no']], h3_level=8, aggfunc=aggfunc)
+    sketch_chunks = (chunk.assign(count=1)[cols + ['rd_no']] for chunk in pd.read_csv(path, nrows=1000, chunksize=300, compression='gzip'))
+    h3df_chunks = PorygonDataFrame().from_h3_chunks(sketch_chunks, h3_level=8, aggfunc=aggfunc)
+    pd.testing.assert_frame_equal(pd.DataFrame(h3df), pd.DataFrame(h3df_chunks))
+    exact = PorygonDataFrame().from_h3(df[cols + ['rd_no']], h3_level=8, aggfunc={'count': 'sum', 'rd_no': 'nunique'})
+    assert (h3df['rd_no'] - exact['rd_no']).abs().max() < 1
+
+
+def test_porygondataframe_n_jobs():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    gpdf = df_to_gpdf(load_chicago_L_stops())
+    gpdf.index.name = 'id'
+
+    # mergeable aggregations are combined from the workers, others are grouped in the parent process
+    for aggfunc in ['sum', 'mean', lambda x: x.median()]:
+        h3df = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']], aggfunc=aggfunc)
+        h3df_parallel = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']], aggfunc=aggfunc, n_jobs=2)
+        pd.testing.assert_frame_equal(pd.DataFrame(h3df), pd.DataFrame(h3df_parallel))
+
+        pdf = PorygonDataFrame().from_voronoi(df[['latitude', 'longitude', 'count']], gpdf, aggfunc=aggfunc)
+        pdf_parallel = PorygonDataFrame().from_voronoi(df[['latitude', 'longitude', 'count']], gpdf, aggfunc=aggfunc, n_jobs=2)
+        pd.testing.assert_frame_equal(pd.DataFrame(pdf), pd.DataFrame(pdf_parallel))
+
+        # the boundaries are sent to the workers once, as WKB
+        boundaries = pdf[['geometry']]
+        pdf = PorygonDataFrame().from_boundaries(df[['latitude', 'longitude', 'count']], boundaries, aggfunc=aggfunc)
+        pdf_parallel = PorygonDataFrame().from_boundaries(df[['latitude', 'longitude', 'count']], boundaries, aggfunc=aggfunc, n_jobs=2)
+        pd.testing.assert_frame_equal(pd.DataFrame(pdf), pd.DataFrame(pdf_parallel))
+
+    # -1 is all cpus, including where the h3 indexing is chunked
+    h3df = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']], aggfunc='sum')
+    pyramid = PorygonDataFrame().from_h3_pyramid(df[['latitude', 'longitude', 'count']], h3_levels=[8], aggfunc='sum', n_jobs=-1, chunksize=100)
+    pd.testing.assert_frame_equal(pd.DataFrame(h3df), pd.DataFrame(pyramid[8]))
+    chunks = [df[['latitude', 'longitude', 'count']][:500], df[['latitude', 'longitude', 'count']][500:]]
+    h3df_chunks = PorygonDataFrame().from_h3_chunks(chunks, aggfunc='sum', n_jobs=-1, chunksize=100)
+    pd.testing.assert_frame_equal(pd.DataFrame(h3df), pd.DataFrame(h3df_chunks))
+
+
+def test_porygondataframe_from_h3_pyramid():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    pyramid = PorygonDataFrame().from_h3_pyramid(df[['latitude', 'longitude', 'count']], h3_levels=[9, 7, 8], aggfunc='sum')
+    assert sorted(pyramid.keys()) == [7, 8, 9]
+
+    expected = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']], h3_level=9, aggfunc='sum')
+    pd.testing.assert_frame_equal(pd.DataFrame(pyramid[9]), pd.DataFrame(expected))
+    for h3_level in [7, 8]:
+        assert pyramid[h3_level]['count'].sum() == expected['count'].sum()
+        assert all(h3.h3_get_resolution(i) == h3_level for i in pyramid[h3_level].index)
+
+
+def test_porygondataframe_to_geojson():
+    box1 = [(0,0), (0,1), (1,1), (1,0)]
+    box2 = [(2,2), (2,3), (3,3), (3,2)]
+    pgdf = PorygonDataFrame(GeoDataFrame({'id': ['a', 'b'], 'val': [1.5, np.nan], 'cat': ['x', 'y'],
+                                          'geometry': [Polygon(box1), MultiPolygon([Polygon(box1), Polygon(box2)])]}).set_index('id'))
+    fc = pgdf.to_feature_collection()
+    expected = pgdf._to_geo()['features']
+    assert [f['id'] for f in fc['features']] == [f['id'] for f in expected]
+    assert [f['properties'] for f in fc['features']] == [{'val': 1.5, 'cat': 'x'}, {'val': None, 'cat': 'y'}]
+    assert all(shape(f['geometry']).equals(shape(e['geometry'])) for f, e in zip(fc['features'], expected))
+
+    # serialized geometry is cached until the geometry changes
+    geojson = pgdf.to_geojson(precision=3)
+    pgdf['val'] = 2
+    assert pgdf.to_geojson(precision=3) != geojson
+    pgdf['geometry'] = [Polygon(box2), Polygon(box1)]
+    assert shape(pgdf.to_feature_collection()['features'][0]['geometry']).equals(Polygon(box2))
+
+
+def test_porygondataframe_join_boundaries(tmp_path, caplog):
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    df['injuries'] = np.arange(len(df))
+    gpdf = df_to_gpdf(load_chicago_L_stops())
+    gpdf.index.name = 'id'
+    boundaries = PorygonDataFrame().from_voronoi(df[['latitude', 'longitude', 'count']], gpdf)[['geometry']]
+
+    # merging on the index of PorygonDataFrame boundaries doesn't convert pandas' intermediate frames
+    pgdf_boundaries = PorygonDataFrame(boundaries)
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        PorygonDataFrame().from_boundaries(df[['latitude', 'longitude', 'count']], pgdf_boundaries)
+    assert 'Converting numeric index' not in caplog.text
+
+    # one assignment aggregated several ways gives the same result as from_boundaries
+    join = PorygonDataFrame().join_boundaries(df[['latitude', 'longitude', 'count', 'injuries']], boundaries)
+    for aggfunc, columns in [('sum', None), ('mean', ['injuries'])]:
+        expected = PorygonDataFrame().from_boundaries(df[['latitude', 'longitude', 'count', 'injuries']], boundaries, aggfunc=aggfunc)
+        expected = expected if columns is None else expected[columns + ['geometry']]
+        pd.testing.assert_frame_equal(pd.DataFrame(join.aggregate(aggfunc, columns=columns)), pd.DataFrame(expected))
+
+    # the polygon index is only built to update the aggregates with new points, and then kept by the join
+    assert join._assign.index is None
+    join.aggregate('sum').update_points(df[['latitude', 'longitude', 'count', 'injuries']].iloc[:10])
+    index = join._assign.index
+    join.aggregate('mean').update_points(df[['latitude', 'longitude', 'count', 'injuries']].iloc[:10])
+    assert index is not None and join._assign.index is index
+
+    # the assignment is persisted, and reused for the same points and boundaries
+    pdf = PorygonDataFrame().from_boundaries(df[['latitude', 'longitude', 'count']], boundaries, cache_dir=tmp_path)
+    assert [p.name for p in tmp_path.iterdir()] == [f'{join.assignment.key}.npz']
+    cached = PorygonDataFrame().join_boundaries(df[['latitude', 'longitude', 'count']], boundaries, cache_dir=tmp_path)
+    assert np.array_equal(cached.assignment.positions, join.assignment.positions)
+    pd.testing.assert_frame_equal(pd.DataFrame(cached.aggregate('sum')), pd.DataFrame(pdf))
+
+
+def test_porygondataframe_update_points():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    df = df[['latitude', 'longitude', 'count']]
+    gpdf = df_to_gpdf(load_chicago_L_stops())
+    gpdf.index.name = 'id'
+
+    # folding in new points one batch at a time gives the same aggregates as building from all the points
+    for aggfunc in ['sum', 'mean']:
+        h3df = PorygonDataFrame().from_h3(df.iloc[:400], aggfunc=aggfunc).update_points(df.iloc[400:700]).update_points(df.iloc[700:])
+        pd.testing.assert_frame_equal(pd.DataFrame(h3df), pd.DataFrame(PorygonDataFrame().from_h3(df, aggfunc=aggfunc)))
+
+        pdf = PorygonDataFrame().from_voronoi(df.iloc[:400], gpdf, aggfunc=aggfunc).update_points(df.iloc[400:])
+        pd.testing.assert_frame_equal(pd.DataFrame(pdf), pd.DataFrame(PorygonDataFrame().from_voronoi(df, gpdf, aggfunc=aggfunc)))
+
+    # the original frame is unchanged
+    h3df = PorygonDataFrame().from_h3(df.iloc[:400])
+    updated = h3df.update_points(df.iloc[400:])
+    assert h3df['count'].sum() == df.iloc[:400].dropna()['count'].sum() and updated['count'].sum() == df.dropna()['count'].sum()
+
+    with pytest.raises(AssertionError):
+        PorygonDataFrame().from_h3(df, aggfunc=lambda x: x.median()).update_points(df)
+
+
+def test_porygondataframe_to_multi_choropleth():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    df['injuries'] = np.arange(len(df)) % 3
+    df['other'] = np.nan
+    pdf = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count', 'injuries', 'other']], h3_level=9)
+
+    # the geometry is embedded once, so several layers are about the size of one
+    one = pdf.to_choropleth('count').get_root().render()
+    multi = pdf.to_multi_choropleth(['count', 'injuries', 'other']).get_root().render()
+    assert len(multi) < len(one)
+    assert multi.count(pdf.index[0]) == 1
+    assert '"injuries":{"values":[' in multi
+
+    multi = pdf.to_multi_choropleth(default='injuries', topojson=True).get_root().render()
+    assert '"default": "injuries"' in multi
+
+    # precision rounds the coordinates, value_digits the values
+    pdf['injuries'] = pdf['injuries'] / 7
+    coarse = pdf.to_multi_choropleth(['injuries'], precision=3, value_digits=2).get_root().render()
+    fine = pdf.to_multi_choropleth(['injuries']).get_root().render()
+    assert re.search(r'\[-87\.\d{4}', fine) and not re.search(r'\[-87\.\d{4}', coarse)
+    values = lambda html: re.search(r'"injuries":\{"values":\[([^\]]*)\]', html).group(1)
+    assert '0.2857' in values(fine) and '0.29' in values(coarse) and '0.286' not in values(coarse)
+
+    with pytest.raises(AssertionError):
+        pdf.to_multi_choropleth(['geometry'])
+    with pytest.raises(ValueError):
+        pdf.to_multi_choropleth(['count'], default='injuries')
+
+
+def test_porygondataframe_to_categorical_map():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    pdf = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']], h3_level=8)
+    pdf['category'] = np.random.default_rng(0).choice(['a', 'b', 'c'], len(pdf))
+    pdf.iloc[:3, pdf.columns.get_loc('category')] = None
+    color_key = {'a': '#ff0000', 'b': '#0000ff'}
+
+    def baseline_style(feature, color_key, nan_fill_color):
+        # the style of each feature as looked up from its row before colors were precomputed
+        category = pdf.loc[feature['id'], 'category']
+        color = color_key[category] if category in color_key.keys() else nan_fill_color
+        return {'weight': 2, 'opacity': 0.7, 'color': color, 'fillColor': color, 'fillOpacity': 0.7}
+
+    import seaborn as sns
+    default_key = dict(zip(pdf['category'].value_counts().index, sns.color_palette('deep', 10).as_hex()))
+    for key, nan_fill_color in [(color_key, 'black'), (None, '#999999')]:
+        m = pdf.to_categorical_map('count', 'category', color_key=key, nan_fill_color=nan_fill_color)
+        layer = next(c for c in m._children.values() if type(c).__name__ == 'GeoJson')
+        features = layer.data['features']
+        assert [f['id'] for f in features] == pdf.index.tolist()
+        for feature in features:
+            assert layer.style_function(feature) == baseline_style(feature, key or default_key, nan_fill_color)
+            # the tooltip fields are in the properties
+            assert feature['properties']['category'] == pdf.loc[feature['id'], 'category']
+            assert feature['properties']['count'] == pdf.loc[feature['id'], 'count']
+
+        # missing categories, and categories without a color, are filled with nan_fill_color
+        colors = pd.Series([layer.style_function(f)['fillColor'] for f in features], index=pdf.index)
+        assert (colors[:3] == nan_fill_color).all()
+        assert (colors[pdf['category'] == 'c'] == (nan_fill_color if key else default_key['c'])).all()
+
+        tooltip = next(c for c in layer._children.values() if type(c).__name__ == 'GeoJsonTooltip')
+        assert tooltip.fields == ['category', 'count']
+
+
+def test_porygondataframe_topojson_maps():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=5000, compression='gzip')
+    df['count'] = 1
+    pdf = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']], h3_level=9)
+    pdf['category'] = np.where(pdf['count'] > 2, 'many', 'few')
+
+    # topojson pages of grids are smaller, with each feature's style looked up from a table of the distinct styles
+    for make_map in [lambda **kw: pdf.to_choropleth('count', **kw), lambda **kw: pdf.to_categorical_map('count', 'category', **kw)]:
+        geojson = make_map().get_root().render()
+        topojson = make_map(topojson=True).get_root().render()
+        assert len(topojson) < len(geojson)
+        assert '"style": {' not in topojson and '"_porygon_style": 0' in topojson
+        assert len(make_map(topojson=True, precision=4).get_root().render()) < len(topojson)
+
+    m = pdf.to_categorical_map('count', 'category', topojson=True, color_key={'many': '#ff0000', 'few': '#0000ff'})
+    layer = next(c for c in m._children.values() if type(c).__name__ == 'TopoJson')
+    colors = [layer.style_table[g['properties']['_porygon_style']]['fillColor'] for g in layer.data['objects']['porygon']['geometries']]
+    assert colors == pdf['category'].map({'many': '#ff0000', 'few': '#0000ff'}).tolist()
+    assert set(layer.data['objects']['porygon']['geometries'][0]['properties']) == {'category', 'count', '_porygon_style'}
+
+
+def test_porygondataframe_to_png(tmp_path):
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip')
+    df['count'] = 1
+    pdf = PorygonDataFrame().from_h3(df[['latitude', 'longitude', 'count']], h3_level=8)
+    pdf['category'] = np.random.choice(['a', 'b', 'c'], len(pdf))
+
+    png = pdf.to_png(col='count', figsize=(2, 2))
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    pdf.to_png(Path(tmp_path, 'categorical.png'), cat_col='category', color_key={'a': 'red', 'b': 'blue'})
+    with pytest.raises(AssertionError):
+        pdf.to_png(col='count', cat_col='category')
+
+    from porygon.plotting import render_pngs
+    paths = [Path(tmp_path, f'{i}.png') for i in range(3)]
+    render_pngs([(pdf, path, {'col': 'count', 'figsize': (2, 2)}) for path in paths], n_jobs=2)
+    assert all(path.read_bytes()[:4] == b'\x89PNG' for path in paths + [Path(tmp_path, 'categorical.png')])
+
+    # empty geometries, e.g. voronoi cells outside the clip, are skipped
+    geometry = pdf.geometry.values.copy()
+    geometry[0] = Polygon()
+    pdf = PorygonDataFrame(pdf.drop(columns='geometry'), geometry=geometry)
+    assert pdf.to_png(col='count', figsize=(2, 2))[:4] == b'\x89PNG'
+    assert pdf.iloc[:1].to_png(col='count', figsize=(2, 2))[:4] == b'\x89PNG'
@@ -0,0 +1,85 @@
+import importlib.util
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+spec = importlib.util.spec_from_file_location('process_data', Path(Path(__file__).parent.parent, 'scripts', 'process_data.py'))
+process_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(process_data)
+
+
+def test_process_chicago_traffic_accidents(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_data, 'RAW_DATA_DIR', tmp_path)
+    monkeypatch.setattr(process_data, 'PROCESSED_DATA_DIR', tmp_path)
+    crashes = pd.DataFrame({
+        'crash_record_id': [f'c{i}' for i in range(10)],
+        'rd_no': [f'JD{i}' for i in range(10)],
+        'crash_date': ['2018-12-31T23:00:00.000'] * 3 + ['2019-06-01T12:00:00.000'] * 7,
+        'latitude': np.linspace(41.7, 41.9, 10),
+        'longitude': np.linspace(-87.8, -87.6, 10),
+        'weather_condition': 'CLEAR',
+    })
+    vehicles = pd.DataFrame({
+        'crash_unit_id': range(20),
+        'crash_record_id': [f'c{i % 10}' for i in range(20)],
+        'unit_type': 'DRIVER',
+        'make': [np.nan] * 5 + ['FORD'] * 15,
+    })
+    crashes.to_csv(Path(tmp_path, 'chicago_traffic_crashes_crashes.csv.gz'), index=False, compression='gzip')
+    vehicles.to_csv(Path(tmp_path, 'chicago_traffic_crashes_vehicles.csv.gz'), index=False, compression='gzip')
+
+    # chunked join on crash_record_id is the same as joining the whole tables
+    process_data.process_chicago_traffic_accidents(chunksize=4)
+    expected = pd.merge(vehicles, crashes, on='crash_record_id')
+    expected = expected.loc[expected['crash_date'].str.startswith('2019')].assign(crash_date='2019-06-01')
+    cols = ['rd_no', 'crash_date', 'latitude', 'longitude', 'unit_type', 'make']
+    sort = lambda df: df[cols].sort_values(['rd_no', 'make']).reset_index(drop=True)
+
+    df = pd.read_csv(Path(tmp_path, 'chicago_traffic_accidents.csv.gz'), compression='gzip')
+    pd.testing.assert_frame_equal(sort(df), sort(expected))
+    pd.testing.assert_frame_equal(pd.read_parquet(Path(tmp_path, 'chicago_traffic_accidents.parquet')), df)
+
+
+def test_process_chicago_L_stops(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_data, 'RAW_DATA_DIR', tmp_path)
+    monkeypatch.setattr(process_data, 'PROCESSED_DATA_DIR', tmp_path)
+    lines = ['red', 'blue', 'g', 'brn', 'p', 'pexp', 'y', 'pnk', 'o']
+    stops = pd.DataFrame({
+        'map_id': [1, 1, 2],
+        'station_name': ['18th', '18th', '35th/Archer'],
+        'station_descriptive_name': ['18th (Pink Line)', '18th (Pink Line)', '35th/Archer (Orange Line)'],
+        'location': [str({'latitude': '41.857908', 'longitude': '-87.669147', 'human_address': '{"address": ""}'})] * 2
+                    + ['{"latitude": "41.829353", "longitude": "-87.680622"}'],
+        **{line: False for line in lines},
+    })
+    stops.to_csv(Path(tmp_path, 'chicago_L_stops.csv.gz'), index=False, compression='gzip')
+
+    process_data.process_chicago_L_stops()
+    df = pd.read_csv(Path(tmp_path, 'chicago_L_stops.csv.gz'), compression='gzip')
+    assert df['station_name'].tolist() == ['18th', '35th/Archer']
+    np.testing.assert_allclose(df[['latitude', 'longitude']].values, [[41.857908, -87.669147], [41.829353, -87.680622]])
+
+
+def test_process_air_quality_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_data, 'RAW_DATA_DIR', tmp_path)
+    monkeypatch.setattr(process_data, 'PROCESSED_DATA_DIR', tmp_path)
+    monitors = pd.DataFrame({
+        'State Code': ['06', '06', 'CC', '17'],
+        'County Code': ['037', '037', '100', '031'],
+        'Site Num': ['0002', '0002', '0110', '0000'],
+        'Sample Duration': ['24 HOUR', '24 HOUR', '24 HOUR', '1 HOUR'],
+        'Latitude': [34.1, 34.1, 45.4, 41.9],
+        'Longitude': [-118.2, -118.2, -75.7, -87.6],
+        'Year': 2019,
+        'Local Site Name': ['LA', 'LA', 'Ottawa', 'Chicago'],
+        'Parameter Name': ['Ozone', 'Ozone', 'Ozone', 'Ozone'],
+        'Arithmetic Mean': [0.04, 0.05, 0.03, 0.02],
+    })
+    monitors.to_csv(Path(tmp_path, 'annual_conc_by_monitor_2019.csv'), index=False)
+
+    process_data.process_air_quality_data(chunksize=2)
+    df = pd.read_csv(Path(tmp_path, 'air_quality_data.csv.gz'), compression='gzip', dtype={'site_code': str})
+    assert df['site_code'].tolist() == ['6372', 'CC100110']
+    assert df['val_mean'].tolist() == [0.04, 0.03]
+    assert pd.read_parquet(Path(tmp_path, 'air_quality_data.parquet'))['site_code'].tolist() == ['6372', 'CC100110']
+    assert process_data._strip_zero_padding(pd.Series(['0000', '010', 'CC'])).tolist() == ['0', '10', 'CC']
@@ -0,0 +1,133 @@
+import pytest
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from h3 import h3
+from shapely.geometry import Point, MultiPoint, Polygon, box
+
+from porygon.utils import latlong_to_h3, h3_to_str, h3_to_polygons, coords_to_voronoi_polygons, nearest_site
+from porygon.utils.join import points_in_polygons
+from porygon.utils.topology import to_topology
+from porygon.utils.sketches import HyperLogLog, TDigest
+from porygon.utils.aggregation import PartialAggregate
+
+from porygon.data import PROCESSED_DATA_DIR
+
+
+def test_latlong_to_h3():
+    df = pd.read_csv(Path(PROCESSED_DATA_DIR, 'chicago_traffic_accidents.csv.gz'), nrows=1000, compression='gzip').dropna(subset=['latitude', 'longitude'])
+    expected = [h3.geo_to_h3(lat, lng, 9) for lat, lng in zip(df.latitude, df.longitude)]
+
+    cells = latlong_to_h3(df.latitude, df.longitude, 9)
+    assert cells.dtype == np.uint64
+    assert h3_to_str(cells).tolist() == expected
+
+    # batched and multi-process indexing give the same cells
+    assert np.array_equal(latlong_to_h3(df.latitude, df.longitude, 9, chunksize=100, n_jobs=2), cells)
+    assert np.array_equal(latlong_to_h3(df.latitude, df.longitude, 9, chunksize=100, n_jobs=-1), cells)
+
+    polygons = h3_to_polygons(np.unique(cells))
+    assert len(polygons) == len(np.unique(cells))
+    assert all(p.geom_type == 'Polygon' for p in polygons)
+
+
+def test_points_in_polygons():
+    polygons = [box(0, 0, 1, 1), box(1, 0, 2, 1), box(0.5, 0.5, 1.5, 1.5)]
+    points = [Point(0.25, 0.25), Point(1.75, 0.25), Point(0.75, 0.75), Point(1, 0.25), Point(5, 5)]
+    positions = points_in_polygons(points, polygons)
+    # overlapping polygons resolve to the last one, points on an edge or outside all polygons are unassigned
+    assert positions.tolist() == [0, 1, 2, -1, -1]
+
+
+def test_nearest_site():
+    rng = np.random.default_rng(0)
+    sites = rng.uniform(0, 1, (50, 2))
+    points = rng.uniform(-0.5, 1.5, (1000, 2))
+    positions = nearest_site(sites[:, 0], sites[:, 1], points[:, 0], points[:, 1])
+    # brute force nearest site, including points outside the convex hull of the sites
+    distances = ((points[:, None, :] - sites[None, :, :]) ** 2).sum(axis=2)
+    assert np.array_equal(positions, distances.argmin(axis=1))
+
+
+def test_coords_to_voronoi_polygons():
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(0, 1, 200), rng.uniform(0, 1, 200)
+    polygons = coords_to_voronoi_polygons(x, y)
+    # edge cells are closed, each cell contains its own site, and the cells tile the bounding box
+    assert all(p.geom_type == 'Polygon' and not p.is_empty for p in polygons)
+    assert all(p.contains(Point(a, b)) for p, a, b in zip(polygons, x, y))
+    assert np.isclose(sum(p.area for p in polygons), MultiPoint(list(zip(x, y))).envelope.buffer(0.1, join_style=2).area, rtol=0.05)
+
+    clipped = coords_to_voronoi_polygons(x, y, clip=(0, 0, 0.5, 1))
+    assert np.isclose(sum(p.area for p in clipped), 0.5)
+    assert all(p.is_empty for p, a in zip(clipped, x) if a > 0.6)
+
+
+def _decode_ring(topology, refs):
+    """Rebuild the coordinates of a ring from its arc references"""
+    scale, translate = np.array(topology['transform']['scale']), np.array(topology['transform']['translate'])
+    coords = []
+    for ref in refs:
+        arc = np.cumsum(topology['arcs'][ref if ref >= 0 else ~ref], axis=0) * scale + translate
+        arc = arc if ref >= 0 else arc[::-1]
+        coords.extend(arc[1:] if coords else arc)
+    return coords
+
+
+def test_to_topology():
+    polygons = [box(0, 0, 1, 1), box(1, 0, 2, 1), box(5, 5, 6, 6)]
+    topology = to_topology(polygons, precision=3)
+    # the shared edge of the neighbouring boxes is stored once, and referenced reversed by one of them
+    assert len(topology['arcs']) == 4
+    refs = [r for g in topology['geometries'] for ring in g['arcs'] for r in ring]
+    assert len(refs) == 5 and sum(r < 0 for r in refs) == 1
+
+    for polygon, geometry in zip(polygons, topology['geometries']):
+        assert geometry['type'] == 'Polygon'
+        assert Polygon(_decode_ring(topology, geometry['arcs'][0])).equals(polygon)
+
+
+def test_sketches():
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.integers(0, 20000, 50000))
+    keys = np.repeat([0, 1], 25000)
+    exact = values.groupby(keys).nunique()
+
+    hll = HyperLogLog()
+    states = hll.sketch(values, keys)
+    for key in [0, 1]:
+        assert abs(hll.result(states[key]) - exact[key]) / exact[key] < 0.05
+    # merged states of each half are the state of the whole
+    halves = [hll.sketch(values[:30000], keys[:30000]), hll.sketch(values[30000:], keys[30000:])]
+    merged = hll.merge([halves[0][1], halves[1][1]])
+    assert (merged == states[1]).all()
+    assert hll.result(hll.sketch(pd.Series([1, 1, 2]), [0, 0, 0])[0]) == pytest.approx(2, abs=0.01)
+
+    values = pd.Series(rng.normal(size=50000))
+    for q in [0.5, 0.95]:
+        digest = TDigest(q)
+        halves = [digest.sketch(values[:30000], keys[:30000]), digest.sketch(values[30000:], keys[30000:])]
+        merged = digest.merge([halves[0][1], halves[1][1]])
+        assert len(merged) <= digest.compression
+        for state, expected in [(halves[0][0], values[:25000].quantile(q)), (merged, values[25000:].quantile(q))]:
+            assert abs(digest.result(state) - expected) < 0.02
+
+
+def test_partial_aggregate_sketches():
+    df = pd.DataFrame({'value': [1.0, 2.0, 2.0, np.nan, np.nan]})
+    by = np.array([0, 0, 0, 1, 1])
+    aggregate = PartialAggregate({'value': [HyperLogLog(), TDigest(0.5), 'count']})
+    # key 1 only has missing values, in the first chunk and after merging another chunk
+    aggregate.update(df.iloc[:4], by[:4]).update(df.iloc[4:], by[4:])
+    result = aggregate.result()
+    assert result.loc[0, ('value', 'nunique_approx')] == pytest.approx(2, abs=0.01)
+    assert result.loc[0, ('value', 'median_approx')] == pytest.approx(2)
+    assert result.loc[1].drop(('value', 'count')).isna().all() and result.loc[1, ('value', 'count')] == 0
+    assert aggregate.regroup(np.zeros(2)).result().loc[0, ('value', 'median_approx')] == pytest.approx(2)
+
+    # differently configured sketches of the same name would share a column
+    with pytest.raises(AssertionError):
+        PartialAggregate({'value': [TDigest(0.5, compression=50), TDigest(0.5)]})
+    with pytest.raises(AssertionError):
+        PartialAggregate({'value': TDigest(0.5, compression=50), 'other': TDigest(0.5)})
+    PartialAggregate({'value': TDigest(0.5), 'other': TDigest(0.5)})